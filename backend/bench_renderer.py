@@ -0,0 +1,201 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Overlay rendering benchmark. Draws the same synthetic detections onto a set
+# of frames with the previous per-box putText drawing, the OverlayRenderer on
+# one thread, and OverlayRenderer.render_many across the thread pool, and
+# reports the median frames per second over --repeat runs. With --video it
+# also times render_tracked on that file, serial against pipelined drawing.
+#
+#   uv run python bench_renderer.py --frames 300 --boxes 22 --alpha 0.6
+#   uv run python bench_renderer.py --video clip.mp4
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from services.box_tracker import BoxTracker
+from services.overlay_renderer import OVERLAY_RENDER_WORKERS, OverlayRenderer
+from services.video_service import VideoService
+
+
+def putText_draw(frame, boxes, alpha: float = 1.0):
+    # Drawing as done before OverlayRenderer, for comparison; below alpha 1.0
+    # it blends a full-frame copy, the straightforward way to get opacity
+    if alpha < 1.0:
+        overlay = putText_draw(frame.copy(), boxes)
+        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, dst=frame)
+        return frame
+    h, w, _ = frame.shape
+    for box in boxes:
+        ymin, xmin, ymax, xmax = box["box_2d"]
+        start_point = (int(xmin * w / 1000), int(ymin * h / 1000))
+        end_point = (int(xmax * w / 1000), int(ymax * h / 1000))
+        cv2.rectangle(frame, start_point, end_point, (0, 255, 0), 2)
+        cv2.putText(
+            frame,
+            box["label"],
+            (start_point[0], start_point[1] - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            (0, 255, 0),
+            2,
+        )
+    return frame
+
+
+def make_boxes(count: int, labels: list):
+    boxes = []
+    for _ in range(count):
+        y, x = random.randint(50, 800), random.randint(0, 900)
+        boxes.append(
+            {
+                "box_2d": [
+                    y,
+                    x,
+                    y + random.randint(80, 200),
+                    x + random.randint(30, 90),
+                ],
+                "label": random.choice(labels),
+            }
+        )
+    return boxes
+
+
+def measure(
+    name: str,
+    func,
+    frames: list,
+    repeat: int,
+    baseline_fps: float | None = None,
+    count: int | None = None,
+):
+    rates = []
+    for _ in range(repeat):
+        copies = [frame.copy() for frame in frames]
+        start = time.perf_counter()
+        func(copies)
+        rates.append((count or len(frames)) / (time.perf_counter() - start))
+    fps = statistics.median(rates)
+    speedup = f"  {fps / baseline_fps:5.2f}x" if baseline_fps else ""
+    print(
+        f"{name:<28} {fps:9.1f} frames/s  "
+        f"(min {min(rates):.1f}, max {max(rates):.1f}){speedup}"
+    )
+    return fps
+
+
+def bench_tracked(video_path: str, workers: int, alpha: float, repeat: int):
+    # Detections on every 12th frame, as in tracked mode
+    service = VideoService(encoder_processes=0)
+    total = service.frame_count(video_path)
+    keyframe_boxes = {i: make_boxes(8, ["player"]) for i in range(0, total, 12)}
+    print(
+        f"\nrender_tracked on {video_path} ({total} frames, decode + encode included)"
+    )
+    output = os.path.join(tempfile.mkdtemp(), "tracked.webm")
+
+    # Tracking alone, for reference
+    def track(_):
+        cap = cv2.VideoCapture(video_path)
+        tracker = BoxTracker()
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if index in keyframe_boxes:
+                tracker.reset(frame, keyframe_boxes[index])
+            else:
+                tracker.update(frame)
+            index += 1
+        cap.release()
+
+    baseline = None
+    for name, count in (("serial", 1), (f"pipelined, {workers} workers", workers)):
+        service.overlay_renderer = OverlayRenderer(alpha=alpha, workers=count)
+        fps = measure(
+            name,
+            lambda _: service.render_tracked(video_path, keyframe_boxes, output),
+            [],
+            repeat,
+            baseline,
+            count=total,
+        )
+        baseline = baseline or fps
+        service.overlay_renderer.close()
+    measure("decode + track only", track, [], repeat, count=total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overlay rendering benchmark")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--boxes", type=int, default=22, help="Boxes per frame")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=OVERLAY_RENDER_WORKERS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--video", help="Also time render_tracked on this video")
+    args = parser.parse_args()
+
+    random.seed(0)
+    labels = ["person", "player", "goalkeeper", "referee"]
+    frame = np.random.default_rng(0).integers(
+        0, 255, (args.height, args.width, 3), dtype=np.uint8
+    )
+    frames = [frame] * args.frames
+    boxes = [make_boxes(args.boxes, labels) for _ in range(args.frames)]
+    renderer = OverlayRenderer(alpha=args.alpha, workers=args.workers)
+    # Warm the label cache and the thread pool so neither is timed
+    renderer.render_many(frames[:1], boxes[:1])
+
+    print(
+        f"{args.frames} frames {args.width}x{args.height}, {args.boxes} boxes/frame, "
+        f"alpha {args.alpha}, {args.workers} workers, median of {args.repeat}"
+    )
+    baseline = measure(
+        "putText per box",
+        lambda fs: [putText_draw(f, b, args.alpha) for f, b in zip(fs, boxes)],
+        frames,
+        args.repeat,
+    )
+    measure(
+        "OverlayRenderer.draw",
+        lambda fs: [renderer.draw(f, b) for f, b in zip(fs, boxes)],
+        frames,
+        args.repeat,
+        baseline,
+    )
+    measure(
+        "OverlayRenderer.render_many",
+        lambda fs: renderer.render_many(fs, boxes),
+        frames,
+        args.repeat,
+        baseline,
+    )
+    renderer.close()
+
+    if args.video:
+        bench_tracked(args.video, args.workers, args.alpha, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Cold-start benchmark. Measures the time to import main and the time from
+# launching uvicorn to the first successful /healthz response, in fresh
+# processes with the real (lazily initialised) GCS and Gemini services, and
+# exits non-zero when the median of either exceeds its budget.
+#
+#   uv run python bench_startup.py --runs 5 --import-budget-ms 1000
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import():
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure_first_request(port: int, timeout: float = 30):
+    url = f"http://127.0.0.1:{port}/healthz"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                with urllib.request.urlopen(url, timeout=1):
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("Server did not become ready in time")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--import-budget-ms", type=float, default=1000)
+    parser.add_argument("--ready-budget-ms", type=float, default=2000)
+    args = parser.parse_args()
+
+    import_times = [measure_import() for _ in range(args.runs)]
+    ready_times = [measure_first_request(args.port) for _ in range(args.runs)]
+
+    failed = False
+    for name, times, budget_ms in [
+        ("import main", import_times, args.import_budget_ms),
+        ("time to first request", ready_times, args.ready_budget_ms),
+    ]:
+        median_ms = statistics.median(times) * 1000
+        ok = median_ms <= budget_ms
+        failed = failed or not ok
+        print(
+            f"{name:<22} median {median_ms:7.1f} ms  "
+            f"min {min(times) * 1000:7.1f} ms  max {max(times) * 1000:7.1f} ms  "
+            f"budget {budget_ms:.0f} ms  {'OK' if ok else 'OVER BUDGET'}"
+        )
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
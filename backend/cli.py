@@ -0,0 +1,298 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Offline batch runner. Runs the analysis pipeline over local videos (a
+# directory, or a manifest listing one path per line) without the HTTP API or
+# GCS, spreading files across worker processes. Processed videos, advice
+# images and model logs are written under --output-dir, and every finished
+# video is appended to a checkpoint manifest so an interrupted run resumes
+# where it stopped. --dry-run swaps in the fake Gemini backend.
+#
+#   uv run python cli.py /archive/footage --output-dir results --processes 4
+#   uv run python cli.py manifest.txt --output-dir results --dry-run
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import shutil
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from services.analysis_service import ANALYSIS_MODE, ANALYSIS_MODES, ANALYSIS_USE_PROXY
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".mkv", ".webm", ".avi")
+CHECKPOINT_NAME = "checkpoint.jsonl"
+
+# Per worker process, created by _init_worker
+_worker = {}
+
+
+def find_videos(inputs: list):
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                videos.extend(
+                    os.path.join(root, name)
+                    for name in sorted(files)
+                    if name.lower().endswith(VIDEO_EXTENSIONS)
+                )
+        elif item.lower().endswith(VIDEO_EXTENSIONS):
+            videos.append(item)
+        else:
+            # Manifest: one video per line, relative to the manifest's directory
+            base = os.path.dirname(os.path.abspath(item))
+            with open(item) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        videos.append(os.path.join(base, line))
+    # Deduplicated, in the order given
+    return list(dict.fromkeys(os.path.abspath(path) for path in videos))
+
+
+def video_id(path: str):
+    # Stable across runs so a resumed video overwrites its own outputs
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha1(path.encode()).hexdigest()[:10]}"
+
+
+def load_checkpoint(path: str, mode: str, backend: str):
+    # Only runs with the same analysis mode and model backend count as done,
+    # so e.g. a dry run never satisfies a later real run
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial last line from an interrupted run
+                continue
+            if (
+                entry.get("status") == "completed"
+                and entry.get("mode") == mode
+                and entry.get("backend") == backend
+            ):
+                completed[entry["input"]] = entry
+    return completed
+
+
+def backend_name(dry_run: bool):
+    return "fake" if dry_run else "gemini"
+
+
+def _init_worker(output_dir: str, dry_run: bool, mode: str):
+    from services.analysis_service import AnalysisService
+    from services.fake_gemini_service import FakeGeminiService
+    from services.gemini_service import GeminiService
+    from services.local_storage_service import LocalStorageService
+    from services.log_service import ModelLogService
+    from services.person_filter import create_person_filter
+    from services.scratch_service import ScratchService
+    from services.video_service import VideoService
+
+    storage = LocalStorageService(root=output_dir)
+    log_dir = os.path.join(output_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    model_log = ModelLogService(
+        path=os.path.join(log_dir, f"model-responses-{os.getpid()}.log")
+    )
+    # Pool workers skip atexit handlers; flush the log via multiprocessing's
+    # exit finalizers instead
+    multiprocessing.util.Finalize(None, model_log.stop, exitpriority=10)
+    if dry_run:
+        gemini = FakeGeminiService(model_log=model_log)
+    else:
+        gemini = GeminiService(model_log=model_log)
+
+    _worker["storage"] = storage
+    _worker["mode"] = mode
+    _worker["backend"] = backend_name(dry_run)
+    _worker["loop"] = asyncio.new_event_loop()
+    _worker["analysis"] = AnalysisService(
+        storage,
+        gemini,
+        VideoService(),
+        ScratchService(),
+        storage.path,
+        create_person_filter(),
+        inline_video=True,
+    )
+
+
+async def _analyze(path: str, file_id: str):
+    storage = _worker["storage"]
+    analysis = _worker["analysis"]
+    blob_name = f"uploads/{file_id}/{os.path.basename(path)}"
+
+    # Same normalization as /upload; the original is only copied into the
+    # output dir when it is what gets analyzed.
+    proxy_uri = None
+    if ANALYSIS_USE_PROXY:
+        async with analysis.scratch_service.workspace(os.path.getsize(path)) as space:
+            proxy_uri = await analysis.create_proxy(path, blob_name, space)
+    if proxy_uri is None:
+        await asyncio.to_thread(storage.upload_file, path, blob_name)
+
+    frames = 0
+    result = None
+    async for event, data in analysis.run(
+        f"gs://local/{blob_name}", file_id, _worker["mode"]
+    ):
+        if event == "detections":
+            frames += 1
+        elif event == "complete":
+            result = data
+    return result, frames
+
+
+def process_video(path: str):
+    file_id = video_id(path)
+    started = time.time()
+    entry = {
+        "input": path,
+        "file_id": file_id,
+        "mode": _worker["mode"],
+        "backend": _worker["backend"],
+        "pid": os.getpid(),
+    }
+    try:
+        result, frames = _worker["loop"].run_until_complete(_analyze(path, file_id))
+        entry.update(status="completed", frames_analyzed=frames)
+        entry["processed_path"] = result["processed_url"]
+        entry["advice_path"] = result["advice_url"]
+        entry["summary"] = result["summary"]
+    except Exception as e:
+        entry.update(status="failed", error=str(e))
+    finally:
+        # Inputs are already on disk; drop the working copies
+        for prefix in ("uploads", "proxies/uploads"):
+            working_dir = _worker["storage"].path(f"{prefix}/{file_id}")
+            shutil.rmtree(working_dir, ignore_errors=True)
+            try:
+                # Drop the now-empty parents unless another worker is using them
+                os.removedirs(os.path.dirname(working_dir))
+            except OSError:
+                pass
+    entry["duration_seconds"] = round(time.time() - started, 3)
+    return entry
+
+
+def print_summary(entries: list, skipped: int, wall_seconds: float):
+    completed = [e for e in entries if e["status"] == "completed"]
+    failed = [e for e in entries if e["status"] == "failed"]
+    frames = sum(e.get("frames_analyzed", 0) for e in completed)
+    durations = [e["duration_seconds"] for e in completed]
+
+    print(f"\nWall time: {wall_seconds:.1f}s")
+    print(
+        f"Videos: {len(completed)} completed, {len(failed)} failed, "
+        f"{skipped} skipped (already in checkpoint)"
+    )
+    if wall_seconds > 0:
+        print(
+            f"Throughput: {len(completed) * 60 / wall_seconds:.2f} videos/min, "
+            f"{frames / wall_seconds:.2f} analyzed frames/s"
+        )
+    if durations:
+        print(
+            f"Per video: median {statistics.median(durations):.1f}s, "
+            f"max {max(durations):.1f}s"
+        )
+    for entry in failed:
+        print(f"  FAILED {entry['input']}: {entry['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the analysis pipeline over local videos"
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Video files, directories or manifest files"
+    )
+    parser.add_argument("--output-dir", default="results")
+    parser.add_argument(
+        "--checkpoint",
+        help=f"Checkpoint manifest (default: <output-dir>/{CHECKPOINT_NAME})",
+    )
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--mode", choices=ANALYSIS_MODES)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Use the fake Gemini backend"
+    )
+    args = parser.parse_args()
+
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = args.checkpoint or os.path.join(output_dir, CHECKPOINT_NAME)
+
+    mode = args.mode or ANALYSIS_MODE
+    backend = backend_name(args.dry_run)
+    videos = find_videos(args.inputs)
+    done = load_checkpoint(checkpoint_path, mode, backend)
+    pending = [path for path in videos if path not in done]
+    skipped = len(videos) - len(pending)
+    print(
+        f"{len(videos)} videos, {skipped} already done, {len(pending)} to process "
+        f"with {args.processes} processes ({mode} mode, {backend} backend)"
+    )
+    if not pending:
+        return
+
+    # Split the CPU between the worker processes instead of giving each one
+    # a pool sized for the whole machine. The worker processes already spread
+    # encoding across cores, so they encode frames inline rather than each
+    # starting its own JPEG encoder processes.
+    threads = str(max(1, (os.cpu_count() or 1) // args.processes))
+    os.environ.setdefault("ANALYSIS_CPU_WORKERS", threads)
+    os.environ.setdefault("OVERLAY_RENDER_WORKERS", threads)
+    os.environ.setdefault("FRAME_ENCODER_PROCESSES", "0")
+
+    entries = []
+    start = time.perf_counter()
+    with (
+        open(checkpoint_path, "a") as checkpoint,
+        ProcessPoolExecutor(
+            max_workers=args.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(output_dir, args.dry_run, mode),
+        ) as pool,
+    ):
+        futures = [pool.submit(process_video, path) for path in pending]
+        for count, future in enumerate(as_completed(futures), 1):
+            entry = future.result()
+            entries.append(entry)
+            checkpoint.write(json.dumps(entry) + "\n")
+            checkpoint.flush()
+            print(
+                f"[{count}/{len(pending)}] {entry['status']:<9} "
+                f"{entry['duration_seconds']:6.1f}s  {entry['input']}"
+            )
+
+    print_summary(entries, skipped, time.perf_counter() - start)
+    if any(entry["status"] == "failed" for entry in entries):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# End-to-end HTTP load test. Boots the FastAPI app with the local storage and
+# fake Gemini backends, drives /upload, /files, /analyze_video and
+# /header-info from concurrent virtual users, and reports throughput,
+# p50/p95/p99 latency per endpoint and server CPU/memory.
+#
+#   uv run python loadtest.py --users 8 --iterations 5 --gemini-latency-ms 800
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def make_sample_video(path: str, seconds: float = 3, fps: int = 30):
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (640, 360))
+    for i in range(int(seconds * fps)):
+        frame = np.full((360, 640, 3), 40, dtype=np.uint8)
+        x = 50 + i * 4 % 500
+        cv2.rectangle(frame, (x, 80), (x + 60, 300), (200, 200, 200), cv2.FILLED)
+        out.write(frame)
+    out.release()
+
+
+def multipart_body(field: str, filename: str, data: bytes):
+    boundary = uuid.uuid4().hex
+    body = (
+        (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            "Content-Type: video/mp4\r\n\r\n"
+        ).encode()
+        + data
+        + f"\r\n--{boundary}--\r\n".encode()
+    )
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def percentile(values: list, pct: float):
+    # Nearest-rank percentile
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, endpoint: str, seconds: float, ok: bool):
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append((seconds, ok))
+
+    def report(self, wall_seconds: float):
+        rows = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = [s for s, _ in samples]
+            errors = sum(not ok for _, ok in samples)
+            rows[endpoint] = {
+                "requests": len(samples),
+                "errors": errors,
+                "throughput_rps": len(samples) / wall_seconds,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+            }
+        return rows
+
+
+def _proc_tree(root_pid: int):
+    # Server pid plus all descendants (uvicorn --workers spawns children)
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def _proc_usage(pid: int):
+    # (cpu seconds, rss bytes) from procfs
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+    return cpu, rss
+
+
+class ResourceSampler(threading.Thread):
+    def __init__(self, pid: int, interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.available = os.path.isdir(f"/proc/{pid}")
+        self.stop_event = threading.Event()
+        self.start_cpu = None
+        self.last_cpu = None
+        self.peak_rss = 0
+        self.rss_samples = []
+
+    def sample(self):
+        cpu_total, rss_total = 0.0, 0
+        for pid in _proc_tree(self.pid):
+            try:
+                cpu, rss = _proc_usage(pid)
+            except OSError:
+                continue
+            cpu_total += cpu
+            rss_total += rss
+        return cpu_total, rss_total
+
+    def run(self):
+        if not self.available:
+            return
+        self.start_cpu, _ = self.sample()
+        while not self.stop_event.wait(self.interval):
+            self.last_cpu, rss = self.sample()
+            self.peak_rss = max(self.peak_rss, rss)
+            self.rss_samples.append(rss)
+
+    def report(self, wall_seconds: float):
+        if not self.available or self.last_cpu is None:
+            return None
+        cpu_seconds = self.last_cpu - self.start_cpu
+        return {
+            "cpu_seconds": cpu_seconds,
+            "avg_cores": cpu_seconds / wall_seconds,
+            "avg_rss_mb": sum(self.rss_samples) / len(self.rss_samples) / 1024**2,
+            "peak_rss_mb": self.peak_rss / 1024**2,
+        }
+
+
+class LoadTest:
+    def __init__(self, base_url: str, video_bytes: bytes, recorder: Recorder):
+        self.base_url = base_url
+        self.video_bytes = video_bytes
+        self.recorder = recorder
+
+    def request(self, endpoint, method, path, body=None, headers=None):
+        url = path if path.startswith("http") else self.base_url + path
+        req = urllib.request.Request(url, data=body, method=method)
+        for key, value in (headers or {}).items():
+            req.add_header(key, value)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=300) as response:
+                payload = response.read()
+                ok = True
+        except urllib.error.HTTPError as e:
+            payload = e.read()
+            ok = False
+        except OSError:
+            payload = b""
+            ok = False
+        self.recorder.add(endpoint, time.perf_counter() - start, ok)
+        return ok, payload
+
+    def fetch_file(self, url: str):
+        # /files (proxy or redirect) or a signed URL, depending on MEDIA_DELIVERY
+        if url:
+            self.request("GET /files", "GET", url)
+
+    def user_iteration(self):
+        body, content_type = multipart_body("file", "clip.mp4", self.video_bytes)
+        ok, payload = self.request(
+            "POST /upload",
+            "POST",
+            "/upload",
+            body=body,
+            headers={"Content-Type": content_type},
+        )
+        if ok:
+            upload = json.loads(payload)
+            self.fetch_file(upload["signed_url"])
+
+            query = urllib.parse.urlencode(
+                {"gcs_uri": upload["gcs_uri"], "file_id": upload["file_id"]}
+            )
+            ok, payload = self.request(
+                "POST /analyze_video", "POST", f"/analyze_video?{query}"
+            )
+            if ok:
+                result = json.loads(payload)
+                self.fetch_file(result["processed_url"])
+                self.fetch_file(result["advice_url"])
+
+        self.request("GET /header-info", "GET", "/header-info")
+
+    def run_user(self, iterations: int):
+        for _ in range(iterations):
+            self.user_iteration()
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(base_url + "/header-info", timeout=2):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def print_report(endpoints: dict, resources: dict | None, wall_seconds: float):
+    print(f"\nWall time: {wall_seconds:.1f}s")
+    header = f"{'endpoint':<22}{'reqs':>6}{'errs':>6}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, row in endpoints.items():
+        print(
+            f"{endpoint:<22}{row['requests']:>6}{row['errors']:>6}"
+            f"{row['throughput_rps']:>8.2f}{row['p50_ms']:>10.1f}"
+            f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+        )
+    if resources:
+        print(
+            f"\nServer CPU: {resources['cpu_seconds']:.1f}s "
+            f"({resources['avg_cores']:.2f} cores avg), "
+            f"RSS avg {resources['avg_rss_mb']:.0f} MB, "
+            f"peak {resources['peak_rss_mb']:.0f} MB"
+        )
+    else:
+        print("\nServer CPU/memory sampling requires /proc (Linux).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test with stubbed backends")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent users")
+    parser.add_argument("--iterations", type=int, default=3, help="Runs per user")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--gemini-latency-ms", type=float, default=500)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--storage-latency-ms", type=float, default=0)
+    parser.add_argument(
+        "--boxes-file", help="JSON file with canned box_2d detections to return"
+    )
+    parser.add_argument(
+        "--media-delivery", choices=["proxy", "redirect", "signed"], default="proxy"
+    )
+    parser.add_argument("--video", help="Video to upload (default: synthetic clip)")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sportsai-loadtest-") as tmp:
+        video_path = args.video or os.path.join(tmp, "clip.mp4")
+        if not args.video:
+            make_sample_video(video_path)
+        with open(video_path, "rb") as f:
+            video_bytes = f.read()
+
+        base_url = f"http://127.0.0.1:{args.port}"
+        env = os.environ | {
+            "PUBLIC_BASE_URL": base_url,
+            "STORAGE_BACKEND": "local",
+            "GEMINI_BACKEND": "fake",
+            "LOCAL_STORAGE_DIR": os.path.join(tmp, "storage"),
+            "LOCAL_STORAGE_LATENCY_MS": str(args.storage_latency_ms),
+            "SCRATCH_DIR": os.path.join(tmp, "scratch"),
+            "MEDIA_DELIVERY": args.media_delivery,
+            "FAKE_GEMINI_LATENCY_MS": str(args.gemini_latency_ms),
+            "FAKE_GEMINI_ERROR_RATE": str(args.gemini_error_rate),
+        }
+        if args.boxes_file:
+            with open(args.boxes_file) as f:
+                env["FAKE_GEMINI_BOXES"] = f.read()
+
+        with open(os.path.join(tmp, "server.log"), "w") as log:
+            server = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "main:app",
+                    "--port",
+                    str(args.port),
+                    "--workers",
+                    str(args.server_workers),
+                    "--log-level",
+                    "warning",
+                ],
+                cwd=BACKEND_DIR,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+            try:
+                if not wait_until_ready(base_url, server, timeout=60):
+                    log.flush()
+                    with open(log.name) as f:
+                        print(f.read())
+                    sys.exit("Server failed to start")
+
+                recorder = Recorder()
+                sampler = ResourceSampler(server.pid)
+                load_test = LoadTest(base_url, video_bytes, recorder)
+
+                print(
+                    f"Running {args.users} users x {args.iterations} iterations "
+                    f"(Gemini latency {args.gemini_latency_ms:.0f} ms, "
+                    f"error rate {args.gemini_error_rate:.0%})..."
+                )
+                sampler.start()
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.users) as pool:
+                    for future in [
+                        pool.submit(load_test.run_user, args.iterations)
+                        for _ in range(args.users)
+                    ]:
+                        future.result()
+                wall_seconds = time.perf_counter() - start
+                sampler.stop_event.set()
+                sampler.join()
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    endpoints = recorder.report(wall_seconds)
+    resources = sampler.report(wall_seconds)
+    print_report(endpoints, resources, wall_seconds)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "wall_seconds": wall_seconds,
+                    "endpoints": endpoints,
+                    "resources": resources,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
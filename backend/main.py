@@ -12,20 +12,59 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import json
 import os
 import uuid
-import cv2
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from pydantic import BaseModel
+from services.analysis_service import ANALYSIS_MODES, AnalysisError, AnalysisService
+from services.batch_service import BatchService
+from services.fake_gemini_service import FakeGeminiService
 from services.gcs_service import GCSService
 from services.gemini_service import GeminiService
+from services.local_storage_service import LocalStorageService
+from services.log_service import ModelLogService
+from services.media_url_service import MediaUrlService
+from services.person_filter import create_person_filter
+from services.scratch_service import ScratchService
 from services.video_service import VideoService
 
-app = FastAPI()
+# Opt-in: resolve credentials and open connections at startup instead of on
+# the first request. Off by default so cold starts stay fast.
+WARMUP_CLIENTS = os.environ.get("WARMUP_CLIENTS", "0") == "1"
+# Exposes recent raw model responses at /debug/model-responses
+ENABLE_DEBUG_ENDPOINTS = os.environ.get("ENABLE_DEBUG_ENDPOINTS", "0") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scratch_service.sweep_stale()
+    try:
+        await asyncio.to_thread(media_url_service.check_signing)
+    except Exception as e:
+        print(f"Could not check storage credentials for signing: {e}")
+    if WARMUP_CLIENTS:
+        try:
+            await asyncio.gather(
+                asyncio.to_thread(gcs_service.warm_up), gemini_service.warm_up()
+            )
+        except Exception as e:
+            print(f"Client warm-up failed: {e}")
+    yield
+    analysis_service.close()
+    video_service.close()
+    await gemini_service.close()
+    gcs_service.close()
+    model_log_service.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -40,24 +79,65 @@ app.add_middleware(
 os.makedirs("assets", exist_ok=True)
 app.mount("/assets", StaticFiles(directory="assets"), name="assets")
 
-gcs_service = GCSService()
-gemini_service = GeminiService()
+# STORAGE_BACKEND=local and GEMINI_BACKEND=fake swap in local stand-ins so the
+# app can run (e.g. under load tests) without GCS or Gemini access.
+LOCAL_STORAGE = os.environ.get("STORAGE_BACKEND") == "local"
+if LOCAL_STORAGE:
+    gcs_service = LocalStorageService()
+else:
+    gcs_service = GCSService()
+
+model_log_service = ModelLogService()
+if os.environ.get("GEMINI_BACKEND") == "fake":
+    gemini_service = FakeGeminiService(model_log=model_log_service)
+else:
+    gemini_service = GeminiService(model_log=model_log_service)
+
 video_service = VideoService()
+scratch_service = ScratchService()
+person_filter = create_person_filter()
+
+
+media_url_service = MediaUrlService(gcs_service)
+analysis_service = AnalysisService(
+    gcs_service,
+    gemini_service,
+    video_service,
+    scratch_service,
+    media_url_service.url_for,
+    person_filter,
+    # Gemini can't read gs://local URIs, so send the video itself
+    inline_video=LOCAL_STORAGE,
+)
+batch_service = BatchService(analysis_service)
 
 
-@app.get("/files/{blob_name:path}")
-async def get_file(blob_name: str, background_tasks: BackgroundTasks):
-    # Keep this for GCS files (video uploads/processed)
-    local_path = f"temp_{blob_name.replace('/', '_')}"
-    if not os.path.exists(local_path):
-        try:
-            gcs_service.download_file(blob_name, local_path)
-        except Exception:
-            raise HTTPException(status_code=404, detail="File not found")
+class BatchRequest(BaseModel):
+    gcs_uris: list[str]
 
-    # Schedule cleanup after serving
-    background_tasks.add_task(os.remove, local_path)
 
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/debug/model-responses")
+async def get_model_responses(limit: int = 50, kind: str | None = None):
+    if not ENABLE_DEBUG_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    return {"responses": model_log_service.recent_responses(limit, kind)}
+
+
+@app.get("/debug/person-filter")
+async def get_person_filter_stats():
+    if not ENABLE_DEBUG_ENDPOINTS or person_filter is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return person_filter.stats()
+
+
+def _media_type(blob_name: str):
     # Determine media type based on extension
     media_type = None
     if blob_name.endswith(".mp4"):
@@ -68,10 +148,55 @@ async def get_file(blob_name: str, background_tasks: BackgroundTasks):
         media_type = "image/jpeg"
     elif blob_name.endswith(".png"):
         media_type = "image/png"
+    return media_type
+
 
+@app.get("/files/{blob_name:path}")
+async def get_file(blob_name: str, background_tasks: BackgroundTasks):
+    if media_url_service.mode == "redirect":
+        # Media bytes go straight from storage to the client
+        signed_url = await asyncio.to_thread(media_url_service.signed_url, blob_name)
+        return RedirectResponse(signed_url, status_code=307)
+
+    # Keep this for GCS files (video uploads/processed)
+    try:
+        size = await asyncio.to_thread(gcs_service.blob_size, blob_name)
+    except ValueError:
+        size = None
+    if size is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    space = await scratch_service.acquire(size)
+    local_path = space.file(blob_name)
+    try:
+        await asyncio.to_thread(gcs_service.download_file, blob_name, local_path)
+    except Exception:
+        await scratch_service.release(space)
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # Schedule cleanup after serving
+    background_tasks.add_task(scratch_service.release, space)
+
+    media_type = _media_type(blob_name)
     return FileResponse(local_path, media_type=media_type)
 
 
+@app.get("/local-media/{blob_name:path}")
+async def get_local_media(blob_name: str, expires: int, signature: str):
+    # Signed-URL target for the local storage backend: serves the stored file
+    # in place, like a storage bucket would, instead of copying it through /files
+    if not isinstance(gcs_service, LocalStorageService):
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not gcs_service.verify_signed_url(blob_name, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+    try:
+        path = gcs_service.path(blob_name)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path, media_type=_media_type(blob_name))
+
+
 @app.get("/header-info")
 async def get_header_info():
     cache_file = "header_cache.json"
@@ -121,119 +246,83 @@ async def get_header_info():
 @app.post("/upload")
 async def upload_video(file: UploadFile = File(...)):
     file_id = str(uuid.uuid4())
-    file_path = f"temp_{file_id}.mp4"
-    try:
+    data = await file.read()
+    # Room for the upload plus its analysis proxy
+    async with scratch_service.workspace(reserve_bytes=2 * len(data)) as space:
+        file_path = space.file(f"{file_id}.mp4")
         with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
+            buffer.write(data)
 
         blob_name = f"uploads/{file_id}/{file.filename}"
-        gcs_uri = gcs_service.upload_file(file_path, blob_name)
-        # Use proxy URL for consistency with other files, or signed URL if preferred
-        signed_url = f"http://localhost:8000/files/{blob_name}"
+        gcs_uri, proxy_uri = await asyncio.gather(
+            asyncio.to_thread(gcs_service.upload_file, file_path, blob_name),
+            analysis_service.create_proxy(file_path, blob_name, space),
+        )
+        # Proxied through /files or signed, depending on MEDIA_DELIVERY
+        signed_url = await asyncio.to_thread(media_url_service.url_for, blob_name)
 
-        return {"gcs_uri": gcs_uri, "signed_url": signed_url, "file_id": file_id}
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        return {
+            "gcs_uri": gcs_uri,
+            "signed_url": signed_url,
+            "file_id": file_id,
+            "proxy_uri": proxy_uri,
+        }
+
+
+def _check_mode(mode: str | None):
+    if mode is not None and mode not in ANALYSIS_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"mode must be one of: {', '.join(ANALYSIS_MODES)}",
+        )
 
 
 @app.post("/analyze_video")
-async def analyze_video(gcs_uri: str, file_id: str):
+async def analyze_video(gcs_uri: str, file_id: str, mode: str | None = None):
     # Background task would be better for long running, but for simplicity we do it here
     # or use BackgroundTasks.
-
-    local_input_path = f"input_{file_id}.mp4"
-    local_output_path = f"output_{file_id}.webm"
-    advice_filename = f"advice_{file_id}.jpg"
-
+    _check_mode(mode)
     try:
-        # 1. Download video
-        bucket_name, blob_name = gcs_service.parse_gs_uri(gcs_uri)
-        gcs_service.download_file(blob_name, local_input_path)
-
-        # 2. Extract frames
-        frames, fps = video_service.extract_frames(local_input_path, sample_rate=5)
-
-        # 3. Analyze frames with Gemini
-        frames_data = []
-        for frame in frames:
-            _, buffer = cv2.imencode(".jpg", frame)
-            frames_data.append(buffer.tobytes())
-
-        # Limit frames to avoid hitting rate limits in prototype
-        print(f"Analyzing {len(frames_data[:10])} frames...")
-        analysis_results = await gemini_service.analyze_frames(frames_data[:10])
-        print(f"Analysis complete. Received {len(analysis_results)} results.")
-
-        # 4. Draw bounding boxes
-        processed_frames = video_service.draw_bounding_boxes(
-            frames[:10], analysis_results, sample_rate=5
-        )
-
-        # 5. Reassemble video
-        video_service.reassemble_video(
-            processed_frames, local_output_path, fps / 5
-        )  # Adjusted FPS for sampled frames
-
-        # 6. Upload to GCS
-        if not os.path.exists(local_output_path):
-            raise HTTPException(
-                status_code=500, detail="Failed to generate processed video"
-            )
-
-        output_blob_name = f"processed/{file_id}/processed_video.webm"
-        gcs_service.upload_file(local_output_path, output_blob_name)
-        output_signed_url = f"http://localhost:8000/files/{output_blob_name}"
+        return await analysis_service.analyze(gcs_uri, file_id, mode)
+    except AnalysisError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Get strategic summary and visual advice
-        strategic_response = await gemini_service.analyze_video_strategic(gcs_uri)
 
-        summary_text = strategic_response
-        advice_url = None
+@app.get("/analyze_video/stream")
+async def analyze_video_stream(gcs_uri: str, file_id: str, mode: str | None = None):
+    # Server-Sent Events: detections, stage progress and summary tokens are
+    # pushed as soon as they are available instead of after the whole pipeline.
+    _check_mode(mode)
 
+    async def event_stream():
         try:
-            # Clean up JSON markdown if present
-            json_str = strategic_response
-            if "```json" in json_str:
-                json_str = json_str.split("```json")[1].split("```")[0]
-            elif "```" in json_str:
-                json_str = json_str.split("```")[1].split("```")[0]
-
-            data = json.loads(json_str)
-            summary_text = data.get("summary", strategic_response)
-
-            # Generate visual advice image
-            timestamp = data.get("key_frame_timestamp")
-            box_2d = data.get("improvement_box_2d")
-            advice = data.get("advice", "Improvement Area")
-
-            if timestamp is not None:
-                if video_service.extract_and_annotate_frame(
-                    local_input_path, timestamp, box_2d, advice, advice_filename
-                ):
-                    advice_blob_name = f"processed/{file_id}/advice.jpg"
-                    gcs_service.upload_file(advice_filename, advice_blob_name)
-                    advice_url = f"http://localhost:8000/files/{advice_blob_name}"
-
+            async for event, data in analysis_service.run(gcs_uri, file_id, mode):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
         except Exception as e:
-            print(f"Error generating visual advice: {e}")
-            # Fallback to just text if JSON parsing or image generation fails
-            pass
-
-        return {
-            "processed_url": output_signed_url,
-            "summary": summary_text,
-            "advice_url": advice_url,
-        }
-
-    finally:
-        # Final cleanup of all local files
-        for path in [local_input_path, local_output_path, advice_filename]:
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                except Exception as e:
-                    print(f"Error deleting {path}: {e}")
+            print(f"Error in analysis stream: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/batches")
+async def create_batch(request: BatchRequest):
+    if not request.gcs_uris:
+        raise HTTPException(status_code=400, detail="gcs_uris must not be empty")
+    batch_id = batch_service.submit(request.gcs_uris)
+    return {"batch_id": batch_id}
+
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    status = batch_service.status(batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return status
 
 
 @app.get("/readme")
@@ -0,0 +1,379 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+SAMPLE_RATE = 5
+# Limit frames to avoid hitting rate limits in prototype
+MAX_ANALYZED_FRAMES = 10
+# "sampled" renders only the analyzed frames; "tracked" detects on sparse
+# keyframes and tracks the boxes across every frame of the video.
+ANALYSIS_MODES = ("sampled", "tracked")
+ANALYSIS_MODE = os.environ.get("ANALYSIS_MODE", "sampled")
+# Minimum frames between keyframes in tracked mode; 0 spreads
+# MAX_ANALYZED_FRAMES keyframes evenly over the whole video
+KEYFRAME_INTERVAL = int(os.environ.get("KEYFRAME_INTERVAL", "0"))
+# Analyze the normalized proxy rendition created at upload time when present
+ANALYSIS_USE_PROXY = os.environ.get("ANALYSIS_USE_PROXY", "1") == "1"
+# Decode/draw/encode stages share one pool so concurrent videos overlap without
+# oversubscribing the CPU; OpenCV releases the GIL for the heavy work.
+# Rendered video bytes per pixel per frame, with headroom over the measured
+# ~0.002 (1280x720) to ~0.008 (320x240); unlike the input, tracked mode writes
+# every frame, so a low-bitrate input can render to several times its size
+RENDER_BYTES_PER_PIXEL = 0.02
+ANALYSIS_CPU_WORKERS = int(
+    os.environ.get("ANALYSIS_CPU_WORKERS", str(os.cpu_count() or 4))
+)
+
+
+class AnalysisError(Exception):
+    pass
+
+
+SUMMARY_FIELD = re.compile(r'"summary"\s*:\s*"')
+
+
+def partial_summary(text: str):
+    # Decoded value of the "summary" string in a possibly incomplete JSON
+    # response, up to the last complete character received so far.
+    match = SUMMARY_FIELD.search(text)
+    if not match:
+        return ""
+    raw = []
+    i = match.end()
+    while i < len(text) and text[i] != '"':
+        length = 1
+        if text[i] == "\\":
+            length = 6 if text[i + 1 : i + 2] == "u" else 2
+            if i + length > len(text):
+                break
+        raw.append(text[i : i + length])
+        i += length
+    try:
+        return json.loads('"' + "".join(raw) + '"')
+    except json.JSONDecodeError:
+        return ""
+
+
+def keyframe_interval(frame_count: int, interval: int = KEYFRAME_INTERVAL):
+    # Widened when needed so MAX_ANALYZED_FRAMES keyframes reach the end of
+    # the video instead of only covering its start
+    spread = math.ceil(frame_count / MAX_ANALYZED_FRAMES)
+    return max(interval if interval > 0 else SAMPLE_RATE, spread)
+
+
+def scratch_estimate(
+    mode: str, input_size: int, frame_count: int, width: int, height: int
+):
+    # Scratch bytes for the input, the rendered video and the advice image
+    rendered = frame_count if mode == "tracked" else MAX_ANALYZED_FRAMES
+    output = max(input_size, int(rendered * width * height * RENDER_BYTES_PER_PIXEL))
+    return input_size + output + width * height
+
+
+def proxy_blob_name(blob_name: str):
+    # Keyed on the full original name, so clips sharing a folder get their own
+    # proxy; the separate prefix keeps it clear of uploaded blobs.
+    return f"proxies/{blob_name}.mp4"
+
+
+class AnalysisService:
+    def __init__(
+        self,
+        gcs_service,
+        gemini_service,
+        video_service,
+        scratch_service,
+        media_url,
+        person_filter=None,
+        inline_video: bool = False,
+    ):
+        self.gcs_service = gcs_service
+        self.gemini_service = gemini_service
+        self.video_service = video_service
+        self.scratch_service = scratch_service
+        self.media_url = media_url
+        self.person_filter = person_filter
+        # Send the video bytes for the strategic summary instead of its URI,
+        # for storage backends Gemini can't read from
+        self.inline_video = inline_video
+        self.cpu_executor = ThreadPoolExecutor(
+            max_workers=ANALYSIS_CPU_WORKERS, thread_name_prefix="analysis-cpu"
+        )
+
+    def close(self):
+        self.cpu_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_cpu(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_executor, func, *args)
+
+    async def run(self, gcs_uri: str, file_id: str, mode: str | None = None):
+        # Yields (event, data) pairs as each stage of the pipeline completes, so
+        # callers can stream progress instead of waiting for the final result.
+        mode = mode or ANALYSIS_MODE
+        if mode not in ANALYSIS_MODES:
+            raise AnalysisError(f"Unknown analysis mode: {mode}")
+
+        _, blob_name = self.gcs_service.parse_gs_uri(gcs_uri)
+        input_blob, input_size = await self._input_blob(blob_name)
+        # Room for the input plus the rendered video and advice image
+        async with self.scratch_service.workspace(2 * input_size) as space:
+            local_input_path = space.file(f"input_{file_id}.mp4")
+            local_output_path = space.file(f"output_{file_id}.webm")
+            advice_filename = space.file(f"advice_{file_id}.jpg")
+
+            # 1. Download video
+            yield "stage", {"stage": "download"}
+            await asyncio.to_thread(
+                self.gcs_service.download_file, input_blob, local_input_path
+            )
+
+            # Size the rest of the job from the video itself; an input estimate
+            # alone undercounts what tracked mode renders
+            frame_count, width, height = await self._run_cpu(
+                self.video_service.probe, local_input_path
+            )
+            needed = scratch_estimate(mode, input_size, frame_count, width, height)
+            await self.scratch_service.extend(space, needed - space.reserved_bytes)
+
+            # 2. Extract frames
+            yield "stage", {"stage": "extract", "mode": mode}
+            interval = SAMPLE_RATE
+            if mode == "tracked":
+                interval = keyframe_interval(frame_count)
+            if self.person_filter is None:
+                # Every frame goes to the model whole; encode while decoding.
+                # Tracked mode decodes the video again to render, so it doesn't
+                # need the frames copied out of the encoder's ring.
+                frames, frames_data, fps = await self._run_cpu(
+                    self.video_service.extract_jpeg_frames,
+                    local_input_path,
+                    interval,
+                    MAX_ANALYZED_FRAMES,
+                    mode != "tracked",
+                )
+                selected = list(range(len(frames_data)))
+                regions = [(0, 0, width, height)] * len(frames_data)
+            else:
+                frames, fps = await self._run_cpu(
+                    self.video_service.extract_frames,
+                    local_input_path,
+                    interval,
+                    MAX_ANALYZED_FRAMES,
+                )
+                regions = await self._run_cpu(self.person_filter.regions, frames)
+                selected = [i for i, region in enumerate(regions) if region is not None]
+                frames_data = await self._run_cpu(
+                    self._encode_frames,
+                    [self._crop(frames[i], regions[i]) for i in selected],
+                )
+
+            # 3. Analyze frames with Gemini
+            skipped = len(regions) - len(selected)
+            yield (
+                "stage",
+                {
+                    "stage": "detect",
+                    "total_frames": len(regions),
+                    "model_calls_saved": skipped,
+                },
+            )
+            print(f"Analyzing {len(frames_data)} frames ({skipped} without people)...")
+            # Frames the person filter dropped are treated as having no detections
+            analysis_results = ["[]"] * len(regions)
+            for i, region in enumerate(regions):
+                if region is None:
+                    yield "detections", {"frame": i, "boxes": [], "skipped": True}
+            async for j, text in self.gemini_service.analyze_frames_iter(frames_data):
+                i = selected[j]
+                boxes = self.video_service.parse_boxes(text, i)
+                if self.person_filter and self.person_filter.crop:
+                    boxes = self.person_filter.to_frame_boxes(
+                        boxes, regions[i], frames[i].shape
+                    )
+                    text = json.dumps(boxes)
+                analysis_results[i] = text
+                yield "detections", {"frame": i, "boxes": boxes}
+            print(f"Analysis complete. Received {len(frames_data)} results.")
+
+            # 4. Draw bounding boxes and 5. reassemble video
+            yield "stage", {"stage": "render"}
+            if mode == "tracked":
+                keyframe_boxes = {
+                    i * interval: self.video_service.parse_boxes(text, i)
+                    for i, text in enumerate(analysis_results)
+                }
+                await self._run_cpu(
+                    self.video_service.render_tracked,
+                    local_input_path,
+                    keyframe_boxes,
+                    local_output_path,
+                )
+            else:
+                await self._run_cpu(
+                    self._render, frames, analysis_results, local_output_path, fps
+                )
+
+            # 6. Upload to GCS
+            if not os.path.exists(local_output_path):
+                raise AnalysisError("Failed to generate processed video")
+
+            yield "stage", {"stage": "upload"}
+            output_blob_name = f"processed/{file_id}/processed_video.webm"
+            await asyncio.to_thread(
+                self.gcs_service.upload_file, local_output_path, output_blob_name
+            )
+            processed_url = await asyncio.to_thread(self.media_url, output_blob_name)
+            yield "processed", {"processed_url": processed_url}
+
+            # Get strategic summary and visual advice
+            yield "stage", {"stage": "summary"}
+            video_bytes = None
+            if self.inline_video:
+                video_bytes = await asyncio.to_thread(self._read_file, local_input_path)
+            # The response is a JSON object; only its summary text is streamed
+            chunks = []
+            streamed = ""
+            async for chunk in self.gemini_service.stream_video_strategic(
+                gcs_uri, video_bytes=video_bytes
+            ):
+                chunks.append(chunk)
+                summary = partial_summary("".join(chunks))
+                if len(summary) > len(streamed):
+                    yield "summary_delta", {"text": summary[len(streamed) :]}
+                    streamed = summary
+            strategic_response = "".join(chunks)
+
+            summary_text, advice_url = await self._visual_advice(
+                strategic_response, local_input_path, advice_filename, file_id
+            )
+
+            result = {
+                "processed_url": processed_url,
+                "summary": summary_text,
+                "advice_url": advice_url,
+            }
+            yield "complete", result
+
+    async def analyze(self, gcs_uri: str, file_id: str, mode: str | None = None):
+        result = None
+        async for event, data in self.run(gcs_uri, file_id, mode):
+            if event == "complete":
+                result = data
+        return result
+
+    async def create_proxy(self, input_path: str, blob_name: str, space):
+        # Transcodes the upload once into the rendition that is analyzed and
+        # rendered; the original is kept untouched.
+        proxy_path = space.file("proxy.mp4")
+        if not await self._run_cpu(
+            self.video_service.transcode_proxy, input_path, proxy_path
+        ):
+            print(f"WARNING: Failed to create analysis proxy for {blob_name}")
+            return None
+        return await asyncio.to_thread(
+            self.gcs_service.upload_file, proxy_path, proxy_blob_name(blob_name)
+        )
+
+    async def _input_blob(self, blob_name: str):
+        # The blob to analyze and its size
+        if ANALYSIS_USE_PROXY:
+            proxy = proxy_blob_name(blob_name)
+            size = await asyncio.to_thread(self.gcs_service.blob_size, proxy)
+            if size is not None:
+                return proxy, size
+            # Uploads from before proxies existed, or a failed transcode
+            print(f"No analysis proxy for {blob_name}, using original")
+        size = await asyncio.to_thread(self.gcs_service.blob_size, blob_name)
+        if size is None:
+            raise AnalysisError(f"Video not found: {blob_name}")
+        return blob_name, size
+
+    def _read_file(self, path: str):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _crop(self, frame, region: tuple):
+        x0, y0, x1, y1 = region
+        return frame[y0:y1, x0:x1]
+
+    def _encode_frames(self, frames: list):
+        frames_data = []
+        for frame in frames:
+            _, buffer = cv2.imencode(".jpg", frame)
+            frames_data.append(buffer.tobytes())
+        return frames_data
+
+    def _render(self, frames, analysis_results, output_path, fps):
+        processed_frames = self.video_service.draw_bounding_boxes(
+            frames, analysis_results, sample_rate=SAMPLE_RATE
+        )
+        self.video_service.reassemble_video(
+            processed_frames, output_path, fps / SAMPLE_RATE
+        )  # Adjusted FPS for sampled frames
+
+    async def _visual_advice(
+        self, strategic_response, local_input_path, advice_filename, file_id
+    ):
+        summary_text = strategic_response
+        advice_url = None
+
+        try:
+            # Clean up JSON markdown if present
+            json_str = strategic_response
+            if "```json" in json_str:
+                json_str = json_str.split("```json")[1].split("```")[0]
+            elif "```" in json_str:
+                json_str = json_str.split("```")[1].split("```")[0]
+
+            data = json.loads(json_str)
+            summary_text = data.get("summary", strategic_response)
+
+            # Generate visual advice image
+            timestamp = data.get("key_frame_timestamp")
+            box_2d = data.get("improvement_box_2d")
+            advice = data.get("advice", "Improvement Area")
+
+            if timestamp is not None:
+                if await self._run_cpu(
+                    self.video_service.extract_and_annotate_frame,
+                    local_input_path,
+                    timestamp,
+                    box_2d,
+                    advice,
+                    advice_filename,
+                ):
+                    advice_blob_name = f"processed/{file_id}/advice.jpg"
+                    await asyncio.to_thread(
+                        self.gcs_service.upload_file,
+                        advice_filename,
+                        advice_blob_name,
+                    )
+                    advice_url = await asyncio.to_thread(
+                        self.media_url, advice_blob_name
+                    )
+
+        except Exception as e:
+            print(f"Error generating visual advice: {e}")
+            # Fallback to just text if JSON parsing or image generation fails
+
+        return summary_text, advice_url
@@ -0,0 +1,147 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import time
+import uuid
+
+# Videos of a batch (and across batches) that may be in the pipeline at once.
+# Each active video sits in a different stage most of the time, so download,
+# decode, Gemini and encode work of different clips overlaps.
+BATCH_MAX_ACTIVE_VIDEOS = int(os.environ.get("BATCH_MAX_ACTIVE_VIDEOS", "4"))
+# Finished batches kept around for status queries
+BATCH_HISTORY = 100
+
+
+class BatchService:
+    def __init__(self, analysis_service, max_active_videos=BATCH_MAX_ACTIVE_VIDEOS):
+        self.analysis_service = analysis_service
+        self.max_active_videos = max_active_videos
+        self.batches = {}
+        self._slots = None
+
+    @property
+    def slots(self):
+        # Created lazily so the service can be built outside of a running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_active_videos)
+        return self._slots
+
+    def submit(self, gcs_uris: list):
+        batch_id = str(uuid.uuid4())
+        batch = {
+            "batch_id": batch_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "videos": [
+                {
+                    "gcs_uri": gcs_uri,
+                    "file_id": str(uuid.uuid4()),
+                    "status": "queued",
+                    "stage": None,
+                    "frames_analyzed": 0,
+                    "started_at": None,
+                    "finished_at": None,
+                    "result": None,
+                    "error": None,
+                }
+                for gcs_uri in gcs_uris
+            ],
+        }
+        self.batches[batch_id] = batch
+        self._prune()
+        batch["task"] = asyncio.create_task(self._run_batch(batch))
+        return batch_id
+
+    def status(self, batch_id: str):
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+
+        videos = batch["videos"]
+        completed = [v for v in videos if v["status"] == "completed"]
+        failed = [v for v in videos if v["status"] == "failed"]
+        frames = sum(v["frames_analyzed"] for v in videos)
+
+        elapsed = None
+        videos_per_minute = None
+        frames_per_second = None
+        if batch["started_at"] is not None:
+            end = batch["finished_at"] or time.time()
+            elapsed = end - batch["started_at"]
+            if elapsed > 0:
+                videos_per_minute = len(completed) * 60 / elapsed
+                frames_per_second = frames / elapsed
+
+        return {
+            "batch_id": batch_id,
+            "status": batch["status"],
+            "total": len(videos),
+            "completed": len(completed),
+            "failed": len(failed),
+            "running": sum(v["status"] == "running" for v in videos),
+            "elapsed_seconds": elapsed,
+            "videos_per_minute": videos_per_minute,
+            "frames_per_second": frames_per_second,
+            "videos": [
+                video | {"duration_seconds": self._duration(video)} for video in videos
+            ],
+        }
+
+    def _duration(self, video):
+        if video["started_at"] is None:
+            return None
+        return (video["finished_at"] or time.time()) - video["started_at"]
+
+    def _prune(self):
+        finished = [
+            batch_id
+            for batch_id, batch in self.batches.items()
+            if batch["finished_at"] is not None
+        ]
+        for batch_id in finished[: max(0, len(finished) - BATCH_HISTORY)]:
+            del self.batches[batch_id]
+
+    async def _run_batch(self, batch):
+        batch["status"] = "running"
+        batch["started_at"] = time.time()
+        await asyncio.gather(*(self._run_video(video) for video in batch["videos"]))
+        batch["finished_at"] = time.time()
+        failed = any(video["status"] == "failed" for video in batch["videos"])
+        batch["status"] = "completed_with_errors" if failed else "completed"
+
+    async def _run_video(self, video):
+        async with self.slots:
+            video["status"] = "running"
+            video["started_at"] = time.time()
+            try:
+                async for event, data in self.analysis_service.run(
+                    video["gcs_uri"], video["file_id"]
+                ):
+                    if event == "stage":
+                        video["stage"] = data["stage"]
+                    elif event == "detections":
+                        video["frames_analyzed"] += 1
+                    elif event == "complete":
+                        video["result"] = data
+                video["status"] = "completed"
+            except Exception as e:
+                print(f"Error analyzing {video['gcs_uri']} in batch: {e}")
+                video["status"] = "failed"
+                video["error"] = str(e)
+            finally:
+                video["finished_at"] = time.time()
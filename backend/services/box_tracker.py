@@ -0,0 +1,105 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cv2
+import numpy as np
+
+# Corner features tracked per box
+TRACK_MAX_CORNERS = 40
+LK_PARAMS = {
+    "winSize": (21, 21),
+    "maxLevel": 3,
+    "criteria": (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+}
+
+
+class BoxTracker:
+    # Carries detection boxes from a keyframe to the following frames with
+    # pyramidal Lucas-Kanade optical flow: corners inside each box are tracked
+    # frame to frame and the box moves by their median displacement. Calling
+    # reset() on the next keyframe re-anchors every box on the new detections.
+    # All boxes share a single calcOpticalFlowPyrLK call per frame.
+    def __init__(self, max_corners: int = TRACK_MAX_CORNERS):
+        self.max_corners = max_corners
+        self.labels = []
+        self.rects = np.empty((0, 4), dtype=np.float32)
+        self.points = np.empty((0, 1, 2), dtype=np.float32)
+        self.owners = np.empty(0, dtype=np.int32)
+        self.prev_gray = None
+
+    def reset(self, frame, boxes: list):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        h, w = gray.shape
+        labels, rects, points, owners = [], [], [], []
+        for box in boxes:
+            box_2d = box.get("box_2d")
+            if not box_2d or len(box_2d) != 4:
+                continue
+            ymin, xmin, ymax, xmax = box_2d
+            x0, x1 = max(0, int(xmin * w / 1000)), min(w, int(xmax * w / 1000))
+            y0, y1 = max(0, int(ymin * h / 1000)), min(h, int(ymax * h / 1000))
+            if x1 <= x0 or y1 <= y0:
+                continue
+
+            index = len(rects)
+            labels.append(box.get("label", "person"))
+            rects.append((x0, y0, x1, y1))
+            mask = np.zeros_like(gray)
+            mask[y0:y1, x0:x1] = 255
+            corners = cv2.goodFeaturesToTrack(
+                gray, self.max_corners, qualityLevel=0.01, minDistance=5, mask=mask
+            )
+            if corners is not None:
+                points.append(corners.astype(np.float32))
+                owners.append(np.full(len(corners), index, dtype=np.int32))
+
+        self.labels = labels
+        self.rects = np.array(rects, dtype=np.float32).reshape(-1, 4)
+        self.points = (
+            np.concatenate(points) if points else np.empty((0, 1, 2), np.float32)
+        )
+        self.owners = np.concatenate(owners) if owners else np.empty(0, np.int32)
+        self.prev_gray = gray
+
+    def update(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.prev_gray is not None and len(self.points):
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(
+                self.prev_gray, gray, self.points, None, **LK_PARAMS
+            )
+            good = status.reshape(-1) == 1
+            motion = (new_points - self.points).reshape(-1, 2)
+            for index in np.unique(self.owners[good]):
+                dx, dy = np.median(motion[good & (self.owners == index)], axis=0)
+                self.rects[index] += (dx, dy, dx, dy)
+            # Boxes that lose all their corners stay where they were last seen
+            self.points = new_points[good]
+            self.owners = self.owners[good]
+        self.prev_gray = gray
+
+    def boxes(self, frame_shape: tuple):
+        # Current boxes in the 0-1000 box_2d convention used by Gemini
+        h, w = frame_shape[:2]
+        return [
+            {
+                "box_2d": [
+                    int(y0 * 1000 / h),
+                    int(x0 * 1000 / w),
+                    int(y1 * 1000 / h),
+                    int(x1 * 1000 / w),
+                ],
+                "label": label,
+            }
+            for label, (x0, y0, x1, y1) in zip(self.labels, self.rects)
+        ]
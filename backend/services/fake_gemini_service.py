@@ -0,0 +1,153 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import os
+import random
+
+import cv2
+import numpy as np
+
+from services.gemini_service import GEMINI_MAX_CONCURRENCY
+from services.log_service import ModelLogService
+
+# Stand-in for GeminiService with the same interface, for load tests and dry
+# runs. Every call sleeps for the configured latency and fails with the
+# configured probability; detections return canned box JSON.
+FAKE_GEMINI_LATENCY_MS = float(os.environ.get("FAKE_GEMINI_LATENCY_MS", "500"))
+FAKE_GEMINI_ERROR_RATE = float(os.environ.get("FAKE_GEMINI_ERROR_RATE", "0"))
+FAKE_GEMINI_BOXES = os.environ.get(
+    "FAKE_GEMINI_BOXES",
+    json.dumps(
+        [
+            {"box_2d": [200, 150, 900, 350], "label": "person"},
+            {"box_2d": [250, 600, 950, 800], "label": "person"},
+        ]
+    ),
+)
+
+
+class FakeGeminiError(Exception):
+    pass
+
+
+class FakeGeminiService:
+    def __init__(
+        self,
+        latency_ms: float = FAKE_GEMINI_LATENCY_MS,
+        error_rate: float = FAKE_GEMINI_ERROR_RATE,
+        boxes_json: str = FAKE_GEMINI_BOXES,
+        model_log: ModelLogService | None = None,
+    ):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.boxes_json = boxes_json
+        self.calls = 0
+        self._limiter = None
+        self.model_log = model_log or ModelLogService()
+
+    @property
+    def limiter(self):
+        # Created lazily so the service can be built outside of a running loop
+        if self._limiter is None:
+            self._limiter = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        return self._limiter
+
+    async def warm_up(self, model: str = "gemini-3-pro-preview"):
+        pass
+
+    async def close(self):
+        pass
+
+    async def _call(self):
+        async with self.limiter:
+            self.calls += 1
+            # +/-20% jitter so concurrent requests don't move in lockstep
+            await asyncio.sleep(self.latency_ms * random.uniform(0.8, 1.2) / 1000)
+            if random.random() < self.error_rate:
+                raise FakeGeminiError("Simulated Gemini failure")
+
+    async def generate_text(self, prompt: str, model: str = "gemini-3-pro-preview"):
+        await self._call()
+        return "# Sports Video Analysis App\n\nGenerated by the fake Gemini backend."
+
+    async def generate_image(
+        self, prompt: str, model: str = "gemini-3-pro-image-preview"
+    ):
+        try:
+            await self._call()
+        except FakeGeminiError:
+            return None
+        _, buffer = cv2.imencode(".png", np.zeros((64, 64, 3), dtype=np.uint8))
+        return buffer.tobytes()
+
+    async def analyze_frames(
+        self, frames_data: list, model: str = "gemini-3-pro-preview"
+    ):
+        results = [None] * len(frames_data)
+        async for i, text in self.analyze_frames_iter(frames_data, model):
+            results[i] = text
+        return results
+
+    async def analyze_frames_iter(
+        self, frames_data: list, model: str = "gemini-3-pro-preview"
+    ):
+        async def indexed(i):
+            await self._call()
+            self.model_log.record_response(
+                "frame", self.boxes_json, model=model, frame=i
+            )
+            return i, self.boxes_json
+
+        tasks = [asyncio.ensure_future(indexed(i)) for i in range(len(frames_data))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _strategic_response(self):
+        return json.dumps(
+            {
+                "summary": "Solid footwork with a consistent rhythm. Recovery after each shot could be quicker.",
+                "key_frame_timestamp": 0.5,
+                "improvement_box_2d": [200, 150, 900, 350],
+                "advice": "Stay lower on recovery",
+            }
+        )
+
+    async def analyze_video_strategic(
+        self,
+        gs_uri: str,
+        model: str = "gemini-3-pro-preview",
+        video_bytes: bytes | None = None,
+    ):
+        await self._call()
+        text = self._strategic_response()
+        self.model_log.record_response("strategic", text, model=model, gs_uri=gs_uri)
+        return text
+
+    async def stream_video_strategic(
+        self,
+        gs_uri: str,
+        model: str = "gemini-3-pro-preview",
+        video_bytes: bytes | None = None,
+    ):
+        await self._call()
+        text = self._strategic_response()
+        self.model_log.record_response("strategic", text, model=model, gs_uri=gs_uri)
+        for start in range(0, len(text), 32):
+            yield text[start : start + 32]
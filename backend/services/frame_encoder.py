@@ -0,0 +1,138 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import queue
+import time
+
+import cv2
+
+from services.frame_ring import FrameRing
+
+# Seconds to wait on the encoder processes before giving up on them
+FRAME_WORKER_TIMEOUT = 60
+# How often a blocked wait checks that the encoder processes are still running
+FRAME_WORKER_POLL_SECONDS = 0.5
+# Largest frame the ring holds (1920x1080 BGR); bigger frames are encoded inline
+FRAME_SLOT_BYTES = 1920 * 1080 * 3
+
+
+class FrameWorkerError(Exception):
+    pass
+
+
+def _jpeg_worker(ring, results):
+    # Runs in a separate process: encodes frames straight out of shared memory
+    while True:
+        item = ring.get()
+        if item is None:
+            break
+        slot, (index, shape) = item
+        _, buffer = cv2.imencode(".jpg", ring.view(slot, shape))
+        ring.release(slot)
+        results.put((index, buffer.tobytes()))
+    ring.close()
+
+
+def encode_jpeg(frame):
+    _, buffer = cv2.imencode(".jpg", frame)
+    return buffer.tobytes()
+
+
+class FrameEncoder:
+    # Long-lived JPEG encoder processes fed through a FrameRing, started once
+    # so each video doesn't pay for spawning them. One video uses the pool at a
+    # time; every wait is bounded and checks the workers are still running, so
+    # a crashed worker raises FrameWorkerError instead of blocking forever.
+    def __init__(self, processes: int, slot_bytes: int = FRAME_SLOT_BYTES, ctx=None):
+        ctx = ctx or multiprocessing.get_context("spawn")
+        self.processes = processes
+        self.ring = FrameRing(processes * 2, slot_bytes, ctx=ctx)
+        self.results = ctx.Queue()
+        self.workers = [
+            ctx.Process(
+                target=_jpeg_worker, args=(self.ring, self.results), daemon=True
+            )
+            for _ in range(processes)
+        ]
+        try:
+            for worker in self.workers:
+                worker.start()
+        except Exception:
+            self.close()
+            raise
+
+    def alive(self):
+        return all(worker.is_alive() for worker in self.workers)
+
+    def _wait(self, get):
+        deadline = time.monotonic() + FRAME_WORKER_TIMEOUT
+        while True:
+            try:
+                return get(timeout=FRAME_WORKER_POLL_SECONDS)
+            except queue.Empty:
+                if not self.alive():
+                    raise FrameWorkerError("JPEG encoder process exited")
+                if time.monotonic() > deadline:
+                    raise FrameWorkerError(
+                        f"No JPEG encoder progress in {FRAME_WORKER_TIMEOUT}s"
+                    )
+
+    def encode(self, read, shape: tuple, keep: bool = True):
+        # read(out) decodes the next frame into out, or into a new array when
+        # its shape differs, and returns it; None ends the video. Frames are
+        # decoded straight into ring slots and encoded there by the worker
+        # processes, so only frames the caller keeps are copied out of the ring.
+        # Returns (kept frames or None, encodings).
+        kept = [] if keep else None
+        submitted = 0
+        inline = {}
+        while True:
+            slot = out = None
+            if self.ring.fits(shape):
+                slot = self._wait(self.ring.acquire)
+                out = self.ring.view(slot, shape)
+            frame = read(out)
+            if frame is not out and slot is not None:
+                # End of the video, or a frame that didn't fit the slot
+                self.ring.release(slot)
+                slot = None
+            if frame is None:
+                break
+            if keep:
+                kept.append(frame.copy() if slot is not None else frame)
+            if slot is not None:
+                self.ring.publish(slot, (submitted, shape))
+            else:
+                inline[submitted] = encode_jpeg(frame)
+            submitted += 1
+
+        encoded = [None] * submitted
+        for index, data in inline.items():
+            encoded[index] = data
+        for _ in range(submitted - len(inline)):
+            index, data = self._wait(self.results.get)
+            encoded[index] = data
+        return kept, encoded
+
+    def close(self):
+        self.ring.finish(self.processes)
+        for worker in self.workers:
+            if worker.pid is None:
+                continue
+            worker.join(timeout=FRAME_WORKER_POLL_SECONDS)
+            if worker.is_alive():
+                worker.terminate()
+        self.ring.close()
+        self.results.close()
@@ -0,0 +1,95 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+# Fixed-size frame slots in shared memory, handed between processes by index.
+# The producer acquires a free slot, writes a frame of any shape that fits into
+# view(slot, shape) and publishes it with the shape; consumers work on a
+# zero-copy view and release the slot for reuse. Only slot indices and small metadata go through the queues, never
+# pixel data, and acquire() blocks while every slot is in use so the producer
+# is throttled to the speed of the consumers.
+class FrameRing:
+    def __init__(self, num_slots: int, slot_nbytes: int, ctx=None):
+        ctx = ctx or multiprocessing.get_context("spawn")
+        self.num_slots = num_slots
+        self.slot_nbytes = slot_nbytes
+        self.shm = SharedMemory(create=True, size=self.slot_nbytes * num_slots)
+        self.shm_name = self.shm.name
+        self.free_slots = ctx.Queue()
+        self.ready_slots = ctx.Queue()
+        self._owner = True
+        for slot in range(num_slots):
+            self.free_slots.put(slot)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["shm"]
+        state["_owner"] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # The creating process owns the block; attaching must not register it
+        # with this process's resource tracker or it would be unlinked early.
+        self.shm = SharedMemory(name=self.shm_name, track=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fits(self, shape: tuple, dtype=np.uint8):
+        return math.prod(shape) * np.dtype(dtype).itemsize <= self.slot_nbytes
+
+    def view(self, slot: int, shape: tuple, dtype=np.uint8):
+        return np.ndarray(
+            shape,
+            dtype=dtype,
+            buffer=self.shm.buf,
+            offset=slot * self.slot_nbytes,
+        )
+
+    def acquire(self, timeout: float | None = None):
+        # Raises queue.Empty when no slot frees up within the timeout
+        return self.free_slots.get(timeout=timeout)
+
+    def publish(self, slot: int, meta=None):
+        self.ready_slots.put((slot, meta))
+
+    def get(self, timeout: float | None = None):
+        # Returns None once the producer has called finish()
+        return self.ready_slots.get(timeout=timeout)
+
+    def release(self, slot: int):
+        self.free_slots.put(slot)
+
+    def finish(self, num_consumers: int):
+        for _ in range(num_consumers):
+            self.ready_slots.put(None)
+
+    def close(self):
+        # Views returned by view() must be dropped before closing, otherwise
+        # the mapping cannot be released.
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+            self.free_slots.close()
+            self.ready_slots.close()
@@ -12,15 +12,57 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from google.cloud import storage
+import threading
 
 BUCKET_NAME = "dw-genai-dev-bucket"
 
 
 class GCSService:
     def __init__(self):
-        self.client = storage.Client()
-        self.bucket = self.client.bucket(BUCKET_NAME)
+        # The storage client is created on first use so the app can start
+        # without credentials; uploads/downloads call in from worker threads.
+        self._client = None
+        self._credentials = None
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        with self._lock:
+            if self._client is None:
+                import google.auth
+                from google.cloud import storage
+
+                # Resolved here rather than by the client so can_sign() can
+                # inspect them
+                credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+                self._credentials = credentials
+                self._client = storage.Client(project=project, credentials=credentials)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._connect()
+        return self._client
+
+    @property
+    def credentials(self):
+        if self._client is None:
+            self._connect()
+        return self._credentials
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            self._bucket = self.client.bucket(BUCKET_NAME)
+        return self._bucket
+
+    def warm_up(self):
+        # Resolves credentials and opens a connection before the first request
+        self.bucket.exists()
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
 
     def upload_file(self, file_path: str, destination_blob_name: str):
         blob = self.bucket.blob(destination_blob_name)
@@ -36,9 +78,49 @@ class GCSService:
         blob = self.bucket.blob(blob_name)
         blob.download_to_filename(destination_file_path)
 
-    def get_signed_url(self, blob_name: str):
+    def blob_size(self, blob_name: str):
+        # None when the blob doesn't exist
+        blob = self.bucket.get_blob(blob_name)
+        return blob.size if blob is not None else None
+
+    def can_sign(self):
+        # Service account keys sign locally and metadata-server credentials
+        # (Cloud Run, GCE) sign through IAM signBlob; user credentials from
+        # `gcloud auth application-default login` can do neither.
+        from google.auth import credentials as auth_credentials
+
+        credentials = self.credentials
+        return isinstance(credentials, auth_credentials.Signing) or hasattr(
+            credentials, "service_account_email"
+        )
+
+    def get_signed_url(self, blob_name: str, expiration: int = 3600):
+        from google.auth import credentials as auth_credentials
+        from google.auth.transport import requests as auth_requests
+
+        if not self.can_sign():
+            raise RuntimeError(
+                "Storage credentials can't sign URLs; use a service account "
+                "or MEDIA_DELIVERY=proxy"
+            )
         blob = self.bucket.blob(blob_name)
-        return blob.generate_signed_url(version="v4", expiration=3600, method="GET")
+        credentials = self.credentials
+        if isinstance(credentials, auth_credentials.Signing):
+            return blob.generate_signed_url(
+                version="v4", expiration=expiration, method="GET"
+            )
+
+        # Metadata-server credentials hold no private key; sign through the
+        # IAM signBlob API with the service account instead.
+        if not credentials.valid:
+            credentials.refresh(auth_requests.Request())
+        return blob.generate_signed_url(
+            version="v4",
+            expiration=expiration,
+            method="GET",
+            service_account_email=credentials.service_account_email,
+            access_token=credentials.token,
+        )
 
     def parse_gs_uri(self, gs_uri: str):
         if not gs_uri.startswith("gs://"):
@@ -1,6 +1,8 @@
 import asyncio
-from google import genai
-from google.genai import types
+import logging
+import os
+
+from services.log_service import ModelLogService
 
 # Copyright 2025 Google LLC
 #
@@ -19,26 +21,73 @@ from google.genai import types
 
 PROJECT_ID = "dw-genai-dev"
 LOCATION = "global"
+# Process-wide cap on in-flight Gemini requests, shared by single and batch analysis
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "8"))
 
 
 class GeminiService:
-    def __init__(self):
-        self.client = genai.Client(vertexai=True, project=PROJECT_ID, location=LOCATION)
-        self.aclient = genai.Client(
-            vertexai=True, project=PROJECT_ID, location=LOCATION
-        ).aio
+    def __init__(self, model_log: ModelLogService | None = None):
+        # google.genai is slow to import and the client needs credentials, so
+        # both are deferred until the first call (or warm_up) instead of
+        # slowing down app startup.
+        self._client = None
+        self._client_lock = None
+        self._limiter = None
+        self.model_log = model_log or ModelLogService()
+
+    def _create_client(self):
+        from google import genai
+
+        return genai.Client(vertexai=True, project=PROJECT_ID, location=LOCATION)
+
+    async def aclient(self):
+        # The import and credential lookup block, so they run in a thread
+        # instead of stalling the event loop during the first request; the
+        # lock makes concurrent first requests share one client.
+        if self._client is None:
+            if self._client_lock is None:
+                self._client_lock = asyncio.Lock()
+            async with self._client_lock:
+                if self._client is None:
+                    self._client = await asyncio.to_thread(self._create_client)
+        # The async API shares the sync client's credentials and configuration
+        return self._client.aio
+
+    async def warm_up(self, model: str = "gemini-3-pro-preview"):
+        # Resolves credentials and opens a connection before the first request
+        aclient = await self.aclient()
+        await aclient.models.get(model=model)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aio.aclose()
+            self._client.close()
+            self._client = None
+
+    @property
+    def limiter(self):
+        # Created lazily so the service can be built outside of a running loop
+        if self._limiter is None:
+            self._limiter = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        return self._limiter
+
+    async def _generate(self, **kwargs):
+        aclient = await self.aclient()
+        async with self.limiter:
+            return await aclient.models.generate_content(**kwargs)
 
     async def generate_text(self, prompt: str, model: str = "gemini-3-pro-preview"):
-        response = await self.aclient.models.generate_content(
-            model=model, contents=prompt
-        )
+        response = await self._generate(model=model, contents=prompt)
+        self.model_log.record_response("text", response.text, model=model)
         return response.text
 
     async def generate_image(
         self, prompt: str, model: str = "gemini-3-pro-image-preview"
     ):
+        from google.genai import types
+
         try:
-            response = await self.aclient.models.generate_content(
+            response = await self._generate(
                 model=model,
                 contents=prompt,
                 config=types.GenerateContentConfig(
@@ -48,63 +97,95 @@ class GeminiService:
             # Assuming the image data is in the first part of the first candidate's content
             if response.candidates and response.candidates[0].content.parts:
                 part = response.candidates[0].content.parts[0]
-                with open("gemini_debug.log", "a") as f:
-                    f.write(f"DEBUG: Part structure: {part}\n")
+                # Log what came back, not the image bytes themselves
+                if part.inline_data:
+                    data = part.inline_data.data or b""
+                    summary = f"<{part.inline_data.mime_type} image, {len(data)} bytes>"
+                else:
+                    summary = part.text
+                self.model_log.record_response("image", summary, model=model)
 
                 if part.inline_data:
                     return part.inline_data.data
                 elif part.text:
-                    with open("gemini_debug.log", "a") as f:
-                        f.write(
-                            f"WARNING: Received text instead of image: {part.text}\n"
-                        )
-            else:
-                with open("gemini_debug.log", "a") as f:
-                    f.write(
-                        f"WARNING: No candidates or parts in response: {response}\n"
+                    self.model_log.log(
+                        logging.WARNING,
+                        "image_returned_text",
+                        model=model,
+                        text=part.text,
                     )
+            else:
+                self.model_log.log(
+                    logging.WARNING,
+                    "image_empty_response",
+                    model=model,
+                    response=repr(response),
+                )
 
             return None  # Return None if no inline data is found
         except Exception as e:
-            with open("gemini_debug.log", "a") as f:
-                f.write(f"ERROR: Exception in generate_image: {e}\n")
+            self.model_log.log(
+                logging.ERROR, "image_generation_failed", model=model, error=str(e)
+            )
             return None
 
+    async def _frame_request(self, frame_bytes: bytes, model: str):
+        from google.genai import types
+
+        # In a real scenario, we might want to batch or send as a single video.
+        # Here we are processing individual frames as requested.
+        part = types.Part.from_bytes(data=frame_bytes, mime_type="image/jpeg")
+        return await self._generate(
+            model=model,
+            contents=[
+                part,
+                "Detect sportsmen bounding boxes. Return JSON format: [{'box_2d': [ymin, xmin, ymax, xmax], 'label': 'person'}]",
+            ],
+        )
+
     async def analyze_frames(
         self, frames_data: list, model: str = "gemini-3-pro-preview"
     ):
-        tasks = []
-        for frame_bytes in frames_data:
-            # In a real scenario, we might want to batch or send as a single video.
-            # Here we are processing individual frames as requested.
-            part = types.Part.from_bytes(data=frame_bytes, mime_type="image/jpeg")
-            tasks.append(
-                self.aclient.models.generate_content(
-                    model=model,
-                    contents=[
-                        part,
-                        "Detect sportsmen bounding boxes. Return JSON format: [{'box_2d': [ymin, xmin, ymax, xmax], 'label': 'person'}]",
-                    ],
-                )
-            )
+        tasks = [self._frame_request(frame_bytes, model) for frame_bytes in frames_data]
         responses = await asyncio.gather(*tasks)
 
         # Log raw responses for debugging
-        with open("gemini_debug.log", "a") as f:
-            for i, r in enumerate(responses):
-                f.write(f"DEBUG: Frame {i} response: {r.text}\n")
+        for i, r in enumerate(responses):
+            self.model_log.record_response("frame", r.text, model=model, frame=i)
 
         return [r.text for r in responses]
 
-    async def analyze_video_strategic(
-        self, gs_uri: str, model: str = "gemini-3-pro-preview"
+    async def analyze_frames_iter(
+        self, frames_data: list, model: str = "gemini-3-pro-preview"
     ):
-        part = types.Part.from_uri(file_uri=gs_uri, mime_type="video/mp4")
-        response = await self.aclient.models.generate_content(
-            model=model,
-            contents=[
-                part,
-                """
+        # Same requests as analyze_frames, but yields (index, text) as soon as
+        # each frame's response arrives instead of waiting for all of them.
+        async def indexed(i, frame_bytes):
+            return i, await self._frame_request(frame_bytes, model)
+
+        tasks = [
+            asyncio.ensure_future(indexed(i, frame_bytes))
+            for i, frame_bytes in enumerate(frames_data)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, r = await next_done
+                self.model_log.record_response("frame", r.text, model=model, frame=i)
+                yield i, r.text
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _strategic_contents(self, gs_uri: str, video_bytes: bytes | None = None):
+        from google.genai import types
+
+        if video_bytes is not None:
+            part = types.Part.from_bytes(data=video_bytes, mime_type="video/mp4")
+        else:
+            part = types.Part.from_uri(file_uri=gs_uri, mime_type="video/mp4")
+        return [
+            part,
+            """
             Analyze this sports video and provide a strategic summary.
             Identify one key frame where the player could improve their technique.
             Return a JSON object with the following fields:
@@ -115,6 +196,40 @@ class GeminiService:
 
             Ensure the response is valid JSON.
             """,
-            ],
+        ]
+
+    async def analyze_video_strategic(
+        self,
+        gs_uri: str,
+        model: str = "gemini-3-pro-preview",
+        video_bytes: bytes | None = None,
+    ):
+        response = await self._generate(
+            model=model,
+            contents=self._strategic_contents(gs_uri, video_bytes),
+        )
+        self.model_log.record_response(
+            "strategic", response.text, model=model, gs_uri=gs_uri
         )
         return response.text
+
+    async def stream_video_strategic(
+        self,
+        gs_uri: str,
+        model: str = "gemini-3-pro-preview",
+        video_bytes: bytes | None = None,
+    ):
+        aclient = await self.aclient()
+        async with self.limiter:
+            stream = await aclient.models.generate_content_stream(
+                model=model,
+                contents=self._strategic_contents(gs_uri, video_bytes),
+            )
+            chunks = []
+            async for chunk in stream:
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+        self.model_log.record_response(
+            "strategic", "".join(chunks), model=model, gs_uri=gs_uri
+        )
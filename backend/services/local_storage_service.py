@@ -0,0 +1,115 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import hmac
+import os
+import random
+import shutil
+import tempfile
+import time
+import urllib.parse
+
+# Filesystem stand-in for GCSService, used for load tests and offline runs.
+# Blobs live under LOCAL_STORAGE_DIR and are addressed as gs://local/<blob>.
+LOCAL_STORAGE_DIR = os.environ.get(
+    "LOCAL_STORAGE_DIR", os.path.join(tempfile.gettempdir(), "sportsai-storage")
+)
+LOCAL_BUCKET_NAME = "local"
+LOCAL_STORAGE_LATENCY_MS = float(os.environ.get("LOCAL_STORAGE_LATENCY_MS", "0"))
+# Stand-in for GCS V4 signing. Set LOCAL_SIGNING_KEY when running several
+# workers so URLs signed by one are accepted by the others.
+LOCAL_SIGNING_KEY = os.environ.get("LOCAL_SIGNING_KEY", "").encode() or os.urandom(32)
+LOCAL_MEDIA_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "http://localhost:8000")
+
+
+class LocalStorageService:
+    def __init__(
+        self,
+        root: str = LOCAL_STORAGE_DIR,
+        latency_ms: float = LOCAL_STORAGE_LATENCY_MS,
+    ):
+        self.root = root
+        self.latency_ms = latency_ms
+        os.makedirs(self.root, exist_ok=True)
+
+    def warm_up(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _simulate_latency(self):
+        if self.latency_ms:
+            # +/-20% jitter so concurrent requests don't move in lockstep
+            time.sleep(self.latency_ms * random.uniform(0.8, 1.2) / 1000)
+
+    def path(self, blob_name: str):
+        path = os.path.abspath(os.path.join(self.root, blob_name))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError("Invalid blob name")
+        return path
+
+    def upload_file(self, file_path: str, destination_blob_name: str):
+        self._simulate_latency()
+        destination = self.path(destination_blob_name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(file_path, destination)
+        return f"gs://{LOCAL_BUCKET_NAME}/{destination_blob_name}"
+
+    def upload_bytes(self, data: bytes, destination_blob_name: str, content_type: str):
+        self._simulate_latency()
+        destination = self.path(destination_blob_name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with open(destination, "wb") as f:
+            f.write(data)
+        return f"gs://{LOCAL_BUCKET_NAME}/{destination_blob_name}"
+
+    def download_file(self, blob_name: str, destination_file_path: str):
+        self._simulate_latency()
+        shutil.copyfile(self.path(blob_name), destination_file_path)
+
+    def blob_size(self, blob_name: str):
+        self._simulate_latency()
+        try:
+            return os.path.getsize(self.path(blob_name))
+        except FileNotFoundError:
+            return None
+
+    def _signature(self, blob_name: str, expires: int):
+        message = f"{blob_name}\n{expires}".encode()
+        return hmac.new(LOCAL_SIGNING_KEY, message, hashlib.sha256).hexdigest()
+
+    def can_sign(self):
+        return True
+
+    def get_signed_url(self, blob_name: str, expiration: int = 3600):
+        # Served straight from disk by the /local-media route, bypassing /files
+        expires = int(time.time()) + expiration
+        query = urllib.parse.urlencode(
+            {"expires": expires, "signature": self._signature(blob_name, expires)}
+        )
+        path = urllib.parse.quote(blob_name)
+        return f"{LOCAL_MEDIA_BASE_URL}/local-media/{path}?{query}"
+
+    def verify_signed_url(self, blob_name: str, expires: int, signature: str):
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(blob_name, expires), signature)
+
+    def parse_gs_uri(self, gs_uri: str):
+        if not gs_uri.startswith("gs://"):
+            raise ValueError("Invalid GS URI")
+        parts = gs_uri[5:].split("/", 1)
+        return parts[0], parts[1]
@@ -0,0 +1,113 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import collections
+import json
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+GEMINI_LOG_PATH = os.environ.get("GEMINI_LOG_PATH", "gemini_debug.log")
+GEMINI_LOG_MAX_BYTES = int(os.environ.get("GEMINI_LOG_MAX_BYTES", str(10 * 1024**2)))
+GEMINI_LOG_BACKUPS = int(os.environ.get("GEMINI_LOG_BACKUPS", "3"))
+# Fraction of DEBUG records (raw model responses) written to disk; warnings
+# and errors are always kept.
+GEMINI_LOG_SAMPLE_RATE = float(os.environ.get("GEMINI_LOG_SAMPLE_RATE", "1.0"))
+# Raw responses kept in memory for the debug endpoint
+GEMINI_RECENT_RESPONSES = int(os.environ.get("GEMINI_RECENT_RESPONSES", "200"))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.sample_rate
+
+
+class ModelLogService:
+    # Callers only put records on an in-memory queue; a background listener
+    # thread formats them as JSON lines and writes them to a size-rotated file,
+    # so logging never blocks the event loop on disk I/O.
+    def __init__(
+        self,
+        path: str = GEMINI_LOG_PATH,
+        max_bytes: int = GEMINI_LOG_MAX_BYTES,
+        backups: int = GEMINI_LOG_BACKUPS,
+        sample_rate: float = GEMINI_LOG_SAMPLE_RATE,
+        recent_size: int = GEMINI_RECENT_RESPONSES,
+    ):
+        self.recent = collections.deque(maxlen=recent_size)
+
+        file_handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, delay=True
+        )
+        file_handler.setFormatter(JsonFormatter())
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(sample_rate))
+
+        # Standalone logger so records don't reach (or get configured by) the
+        # root logger handlers that uvicorn installs
+        self.logger = logging.Logger("sportsai.gemini", logging.DEBUG)
+        self.logger.addHandler(queue_handler)
+
+        self.listener = QueueListener(log_queue, file_handler)
+        self._file_handler = file_handler
+        self._started = False
+
+    def start(self):
+        if not self._started:
+            self.listener.start()
+            self._started = True
+            atexit.register(self.stop)
+
+    def stop(self):
+        # Drains pending records before returning
+        if self._started:
+            self.listener.stop()
+            self._file_handler.close()
+            self._started = False
+            atexit.unregister(self.stop)
+
+    def log(self, level: int, event: str, **fields):
+        self.start()
+        self.logger.log(level, event, extra={"fields": fields})
+
+    def record_response(self, kind: str, text, **fields):
+        self.recent.append({"ts": time.time(), "kind": kind, "text": text, **fields})
+        self.log(logging.DEBUG, "model_response", kind=kind, text=text, **fields)
+
+    def recent_responses(self, limit: int = 50, kind: str | None = None):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        responses = [r for r in self.recent if kind is None or r["kind"] == kind]
+        return responses[-limit:][::-1]
@@ -0,0 +1,83 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import os
+import threading
+import time
+
+# How media URLs handed to clients are built:
+#   proxy    - /files/<blob>, bytes are streamed through the API (default)
+#   redirect - /files/<blob>, answered with a redirect to a signed URL
+#   signed   - short-lived signed URLs returned directly
+MEDIA_DELIVERY = os.environ.get("MEDIA_DELIVERY", "proxy")
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "http://localhost:8000")
+SIGNED_URL_TTL_SECONDS = int(os.environ.get("SIGNED_URL_TTL_SECONDS", "900"))
+# Cached URLs are re-signed once they get this close to expiring, so a client
+# never receives one that is about to stop working.
+SIGNED_URL_REFRESH_SECONDS = int(os.environ.get("SIGNED_URL_REFRESH_SECONDS", "300"))
+SIGNED_URL_CACHE_SIZE = 10000
+
+
+class MediaUrlService:
+    def __init__(
+        self,
+        storage_service,
+        mode: str = MEDIA_DELIVERY,
+        base_url: str = PUBLIC_BASE_URL,
+        ttl_seconds: int = SIGNED_URL_TTL_SECONDS,
+        refresh_seconds: int = SIGNED_URL_REFRESH_SECONDS,
+    ):
+        if mode not in ("proxy", "redirect", "signed"):
+            raise ValueError(f"Unknown MEDIA_DELIVERY mode: {mode}")
+        self.storage_service = storage_service
+        self.mode = mode
+        self.base_url = base_url
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = refresh_seconds
+        self.cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_signing(self):
+        # Signed delivery fails every media request when the storage
+        # credentials can't sign, so stream through /files instead
+        if self.mode != "proxy" and not self.storage_service.can_sign():
+            print(
+                f"WARNING: Storage credentials can't sign URLs; "
+                f"MEDIA_DELIVERY={self.mode} falls back to proxy"
+            )
+            self.mode = "proxy"
+
+    def url_for(self, blob_name: str):
+        if self.mode == "signed":
+            return self.signed_url(blob_name)
+        return f"{self.base_url}/files/{blob_name}"
+
+    def signed_url(self, blob_name: str):
+        now = time.time()
+        with self._lock:
+            cached = self.cache.get(blob_name)
+            if cached and cached[1] - now > self.refresh_seconds:
+                self.cache.move_to_end(blob_name)
+                return cached[0]
+
+        url = self.storage_service.get_signed_url(
+            blob_name, expiration=self.ttl_seconds
+        )
+        with self._lock:
+            self.cache[blob_name] = (url, now + self.ttl_seconds)
+            self.cache.move_to_end(blob_name)
+            while len(self.cache) > SIGNED_URL_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return url
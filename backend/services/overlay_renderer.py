@@ -0,0 +1,198 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# Opacity of boxes and labels; below 1.0 they are blended over the frame
+OVERLAY_ALPHA = float(os.environ.get("OVERLAY_ALPHA", "1.0"))
+OVERLAY_RENDER_WORKERS = int(
+    os.environ.get("OVERLAY_RENDER_WORKERS", str(os.cpu_count() or 4))
+)
+# Rasterized labels kept per renderer
+LABEL_SPRITE_CACHE_SIZE = 256
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class OverlayRenderer:
+    # Draws box_2d detections (0-1000, [ymin, xmin, ymax, xmax]) onto frames.
+    # Each distinct label is rasterized once into a sprite and a mask, then
+    # copied into place on every frame instead of calling putText per box.
+    def __init__(
+        self,
+        color: tuple = (0, 255, 0),
+        thickness: int = 2,
+        font_scale: float = 0.5,
+        text_color: tuple | None = None,
+        fill_label: bool = False,
+        alpha: float = OVERLAY_ALPHA,
+        workers: int = OVERLAY_RENDER_WORKERS,
+    ):
+        self.color = color
+        self.thickness = thickness
+        self.font_scale = font_scale
+        self.text_color = text_color or color
+        self.fill_label = fill_label
+        self.alpha = alpha
+        self.workers = workers
+        self.sprites = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _sprite(self, label: str):
+        sprite = self.sprites.get(label)
+        if sprite is not None:
+            return sprite
+
+        (text_w, text_h), baseline = cv2.getTextSize(
+            label, LABEL_FONT, self.font_scale, self.thickness
+        )
+        pad = 3 if self.fill_label else 0
+        height = text_h + baseline + 2 * pad
+        width = text_w + 2 * pad
+        text_mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.putText(
+            text_mask,
+            label,
+            (pad, pad + text_h),
+            LABEL_FONT,
+            self.font_scale,
+            255,
+            self.thickness,
+        )
+
+        pixels = np.empty((height, width, 3), dtype=np.uint8)
+        pixels[:] = self.color
+        pixels[text_mask > 0] = self.text_color
+        mask = np.full_like(text_mask, 255) if self.fill_label else text_mask
+        sprite = (pixels, mask)
+
+        with self._lock:
+            self.sprites[label] = sprite
+            # Oldest labels go first; lookups stay lock-free
+            while len(self.sprites) > LABEL_SPRITE_CACHE_SIZE:
+                self.sprites.pop(next(iter(self.sprites)))
+        return sprite
+
+    def to_pixels(self, boxes: list, frame_shape: tuple):
+        # (x0, y0, x1, y1) pixel rects and labels for all valid boxes at once
+        valid = [
+            box
+            for box in boxes
+            if isinstance(box, dict) and box.get("box_2d") and len(box["box_2d"]) == 4
+        ]
+        if not valid:
+            return np.empty((0, 4), dtype=np.int32), []
+        h, w = frame_shape[:2]
+        box_2d = np.array([box["box_2d"] for box in valid], dtype=np.float32)
+        rects = box_2d[:, [1, 0, 3, 2]] * np.array([w, h, w, h], np.float32) / 1000
+        rects = np.clip(rects, 0, [w - 1, h - 1, w - 1, h - 1]).astype(np.int32)
+        labels = [str(box.get("label", "person")) for box in valid]
+        return rects, labels
+
+    def _blit(self, canvas, sprite, x: int, y: int):
+        pixels, mask = sprite
+        h, w = canvas.shape[:2]
+        sh, sw = mask.shape
+        # Clip sprites that hang off the canvas edges
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sw, w), min(y + sh, h)
+        if x1 <= x0 or y1 <= y0:
+            return
+        sprite_rows = slice(y0 - y, y1 - y)
+        sprite_cols = slice(x0 - x, x1 - x)
+        cv2.copyTo(
+            pixels[sprite_rows, sprite_cols],
+            mask[sprite_rows, sprite_cols],
+            canvas[y0:y1, x0:x1],
+        )
+
+    def _draw(self, canvas, rects, labels, offset_x: int = 0, offset_y: int = 0):
+        rects = rects - np.array([offset_x, offset_y, offset_x, offset_y], np.int32)
+        # Every box outline in a single call
+        corners = rects[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+        cv2.polylines(canvas, corners, True, self.color, self.thickness)
+        for (x0, y0, _, _), label in zip(rects.tolist(), labels):
+            sprite = self._sprite(label)
+            # Label sits just above the box's top-left corner
+            self._blit(canvas, sprite, x0, y0 - sprite[1].shape[0] - self.thickness)
+
+    def draw(self, frame, boxes: list):
+        rects, labels = self.to_pixels(boxes, frame.shape)
+        if not labels:
+            return frame
+        if self.alpha >= 1.0:
+            self._draw(frame, rects, labels)
+            return frame
+
+        # Blend only the region covered by the boxes and their labels
+        h, w = frame.shape[:2]
+        label_h = max(self._sprite(label)[1].shape[0] for label in labels)
+        label_w = max(self._sprite(label)[1].shape[1] for label in labels)
+        margin = self.thickness + 1
+        rx0 = max(0, int(rects[:, 0].min()) - margin)
+        ry0 = max(0, int(rects[:, 1].min()) - label_h - 2 * margin)
+        rx1 = min(
+            w, max(int(rects[:, 2].max()), int(rects[:, 0].max()) + label_w) + margin
+        )
+        ry1 = min(h, int(rects[:, 3].max()) + margin)
+        region = frame[ry0:ry1, rx0:rx1]
+        overlay = region.copy()
+        self._draw(overlay, rects, labels, rx0, ry0)
+        cv2.addWeighted(overlay, self.alpha, region, 1 - self.alpha, 0, dst=region)
+        return frame
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="overlay"
+                )
+            return self._executor
+
+    def render_many(self, frames: list, boxes_per_frame: list):
+        # Draws in place across a thread pool; OpenCV and numpy release the
+        # GIL while rasterizing and copying pixels.
+        if self.workers <= 1:
+            return [
+                self.draw(frame, boxes) for frame, boxes in zip(frames, boxes_per_frame)
+            ]
+        return list(self._pool().map(self.draw, frames, boxes_per_frame))
+
+    def render_stream(self, items):
+        # render_many for an iterable of (frame, boxes) pairs: frames are drawn
+        # on the pool while the caller produces the next ones, and yielded in
+        # order with at most two per worker in flight.
+        if self.workers <= 1:
+            for frame, boxes in items:
+                yield self.draw(frame, boxes)
+            return
+        executor = self._pool()
+        pending = collections.deque()
+        for frame, boxes in items:
+            pending.append(executor.submit(self.draw, frame, boxes))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
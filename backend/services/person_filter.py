@@ -0,0 +1,151 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+
+import cv2
+
+# Optional CPU pre-filter in front of Gemini frame detection, using the HOG
+# people detector bundled with OpenCV. Frames without a person are not sent to
+# the model at all; with cropping enabled only the region around the detected
+# people is sent. HOG misses people smaller than its 64x128 window, so wide
+# shots of distant players may be dropped; tune the confidence accordingly.
+PERSON_FILTER_ENABLED = os.environ.get("PERSON_FILTER_ENABLED", "0") == "1"
+PERSON_FILTER_MIN_CONFIDENCE = float(
+    os.environ.get("PERSON_FILTER_MIN_CONFIDENCE", "0.3")
+)
+PERSON_FILTER_CROP = os.environ.get("PERSON_FILTER_CROP", "0") == "1"
+# Frames are downscaled to this width before detection
+PERSON_FILTER_MAX_WIDTH = int(os.environ.get("PERSON_FILTER_MAX_WIDTH", "640"))
+# Margin around the detected people, as a fraction of the region size
+PERSON_FILTER_PADDING = 0.25
+
+
+class PersonFilter:
+    def __init__(
+        self,
+        min_confidence: float = PERSON_FILTER_MIN_CONFIDENCE,
+        crop: bool = PERSON_FILTER_CROP,
+        max_width: int = PERSON_FILTER_MAX_WIDTH,
+        padding: float = PERSON_FILTER_PADDING,
+    ):
+        if not hasattr(cv2, "HOGDescriptor"):
+            # Moved out of the main OpenCV package in 5.x
+            raise RuntimeError("The person filter requires OpenCV 4.x")
+        self.min_confidence = min_confidence
+        self.crop = crop
+        self.max_width = max_width
+        self.padding = padding
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.frames_cropped = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def hog(self):
+        # One detector per thread; frames are filtered from the CPU pool
+        if not hasattr(self._local, "hog"):
+            hog = cv2.HOGDescriptor()
+            hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+            self._local.hog = hog
+        return self._local.hog
+
+    def stats(self):
+        return {
+            "frames_checked": self.frames_checked,
+            "model_calls_saved": self.frames_skipped,
+            "frames_cropped": self.frames_cropped,
+        }
+
+    def detect(self, frame):
+        h, w, _ = frame.shape
+        scale = min(1.0, self.max_width / w)
+        small = frame
+        if scale < 1.0:
+            small = cv2.resize(
+                frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA
+            )
+        rects, weights = self.hog.detectMultiScale(
+            small, winStride=(8, 8), padding=(8, 8), scale=1.05
+        )
+        return [
+            tuple(int(v / scale) for v in rect)
+            for rect, weight in zip(rects, weights)
+            if float(weight) >= self.min_confidence
+        ]
+
+    def region(self, frame):
+        # (x0, y0, x1, y1) to send to the model, or None to skip the frame
+        people = self.detect(frame)
+        h, w, _ = frame.shape
+        with self._stats_lock:
+            self.frames_checked += 1
+            if not people:
+                self.frames_skipped += 1
+                return None
+            if not self.crop:
+                return 0, 0, w, h
+            self.frames_cropped += 1
+
+        x0 = min(x for x, _, _, _ in people)
+        y0 = min(y for _, y, _, _ in people)
+        x1 = max(x + pw for x, _, pw, _ in people)
+        y1 = max(y + ph for _, y, _, ph in people)
+        pad_x = int((x1 - x0) * self.padding)
+        pad_y = int((y1 - y0) * self.padding)
+        return (
+            max(0, x0 - pad_x),
+            max(0, y0 - pad_y),
+            min(w, x1 + pad_x),
+            min(h, y1 + pad_y),
+        )
+
+    def regions(self, frames: list):
+        return [self.region(frame) for frame in frames]
+
+    def to_frame_boxes(self, boxes: list, region: tuple, frame_shape: tuple):
+        # Maps box_2d values (0-1000, relative to the crop) back to the full frame
+        x0, y0, x1, y1 = region
+        h, w = frame_shape[:2]
+        mapped = []
+        for box in boxes:
+            box_2d = box.get("box_2d")
+            if not box_2d or len(box_2d) != 4:
+                continue
+            ymin, xmin, ymax, xmax = box_2d
+            mapped.append(
+                {
+                    **box,
+                    "box_2d": [
+                        int((y0 + ymin * (y1 - y0) / 1000) * 1000 / h),
+                        int((x0 + xmin * (x1 - x0) / 1000) * 1000 / w),
+                        int((y0 + ymax * (y1 - y0) / 1000) * 1000 / h),
+                        int((x0 + xmax * (x1 - x0) / 1000) * 1000 / w),
+                    ],
+                }
+            )
+        return mapped
+
+
+def create_person_filter(enabled: bool = PERSON_FILTER_ENABLED):
+    # None when disabled or unavailable; the pipeline then sends every frame
+    if not enabled:
+        return None
+    try:
+        return PersonFilter()
+    except RuntimeError as e:
+        print(f"WARNING: Person filter disabled: {e}")
+        return None
@@ -0,0 +1,157 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import asynccontextmanager
+
+# Scratch space lives on tmpfs when SCRATCH_USE_TMPFS is set and /dev/shm exists,
+# otherwise under the system temp dir. SCRATCH_DIR overrides both.
+SCRATCH_DIR = os.environ.get("SCRATCH_DIR")
+SCRATCH_USE_TMPFS = os.environ.get("SCRATCH_USE_TMPFS", "0") == "1"
+SCRATCH_BUDGET_BYTES = int(os.environ.get("SCRATCH_BUDGET_BYTES", 2 * 1024**3))
+
+JOB_DIR_PREFIX = "job-"
+
+
+def _default_root():
+    if SCRATCH_DIR:
+        return SCRATCH_DIR
+    if SCRATCH_USE_TMPFS and os.path.isdir("/dev/shm"):
+        return "/dev/shm/sportsai-scratch"
+    return os.path.join(tempfile.gettempdir(), "sportsai-scratch")
+
+
+def _pid_alive(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ScratchSpace:
+    def __init__(self, path: str, reserved_bytes: int):
+        self.path = path
+        self.reserved_bytes = reserved_bytes
+
+    def file(self, name: str):
+        # Blob names contain slashes; keep everything flat inside the job dir
+        return os.path.join(self.path, name.replace("/", "_"))
+
+    def usage(self):
+        total = 0
+        for entry in os.scandir(self.path):
+            if entry.is_file(follow_symlinks=False):
+                total += entry.stat().st_size
+        return total
+
+
+class ScratchService:
+    def __init__(
+        self,
+        root: str | None = None,
+        budget_bytes: int = SCRATCH_BUDGET_BYTES,
+    ):
+        self.root = root or _default_root()
+        self.budget_bytes = budget_bytes
+        self.reserved_bytes = 0
+        self._condition = None
+        os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def condition(self):
+        # Created lazily so the service can be built outside of a running loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def sweep_stale(self):
+        # Job dirs are named job-<pid>-<uuid>; anything owned by a dead process
+        # was left behind by a crash and can be removed.
+        removed = 0
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or not entry.name.startswith(JOB_DIR_PREFIX):
+                continue
+            try:
+                pid = int(entry.name[len(JOB_DIR_PREFIX) :].split("-", 1)[0])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+        if removed:
+            print(f"Removed {removed} stale scratch directories from {self.root}")
+        return removed
+
+    async def acquire(self, reserve_bytes: int):
+        # Callers reserve what they expect to write (blob sizes, upload length)
+        # A single job larger than the whole budget would otherwise wait forever
+        reserve_bytes = min(reserve_bytes, self.budget_bytes)
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: self.reserved_bytes + reserve_bytes <= self.budget_bytes
+            )
+            self.reserved_bytes += reserve_bytes
+
+        path = os.path.join(
+            self.root, f"{JOB_DIR_PREFIX}{os.getpid()}-{uuid.uuid4().hex}"
+        )
+        os.makedirs(path)
+        return ScratchSpace(path, reserve_bytes)
+
+    async def extend(self, space: ScratchSpace, extra_bytes: int):
+        # Grows a held reservation once the job knows what it will write.
+        # Never waits: a job blocking here while holding space could deadlock
+        # with others, so the budget may be over-committed for a while and new
+        # jobs wait in acquire() until it drains.
+        extra_bytes = min(extra_bytes, self.budget_bytes - space.reserved_bytes)
+        if extra_bytes <= 0:
+            return
+        async with self.condition:
+            self.reserved_bytes += extra_bytes
+            space.reserved_bytes += extra_bytes
+
+    async def release(self, space: ScratchSpace):
+        try:
+            used = space.usage()
+            if used > space.reserved_bytes:
+                print(
+                    f"WARNING: Scratch job {space.path} used {used} bytes, "
+                    f"{space.reserved_bytes} reserved"
+                )
+            shutil.rmtree(space.path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error deleting scratch directory {space.path}: {e}")
+
+        async with self.condition:
+            self.reserved_bytes -= space.reserved_bytes
+            space.reserved_bytes = 0
+            self.condition.notify_all()
+
+    @asynccontextmanager
+    async def workspace(self, reserve_bytes: int):
+        space = await self.acquire(reserve_bytes)
+        try:
+            yield space
+        finally:
+            await self.release(space)
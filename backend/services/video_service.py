@@ -14,11 +14,53 @@
 
 import cv2
 import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+from services.box_tracker import BoxTracker
+from services.frame_encoder import FrameEncoder, FrameWorkerError, encode_jpeg
+from services.overlay_renderer import OverlayRenderer
+
+# Analysis proxy rendition produced at upload time
+PROXY_MAX_HEIGHT = int(os.environ.get("PROXY_MAX_HEIGHT", "720"))
+PROXY_FPS = float(os.environ.get("PROXY_FPS", "30"))
+PROXY_GOP = int(os.environ.get("PROXY_GOP", "15"))
+# Drawn frames buffered ahead of the video writer in tracked rendering
+RENDER_WRITE_QUEUE = 8
+# JPEG encoder processes for sampled frames, leaving a core for decoding;
+# 0 encodes in the calling thread
+FRAME_ENCODER_PROCESSES = int(
+    os.environ.get(
+        "FRAME_ENCODER_PROCESSES", str(min(2, max(0, (os.cpu_count() or 1) - 1)))
+    )
+)
 
 
 class VideoService:
-    def __init__(self):
-        pass
+    def __init__(self, encoder_processes: int = FRAME_ENCODER_PROCESSES):
+        self.encoder_processes = encoder_processes
+        self._encoder = None
+        self._encoder_lock = threading.Lock()
+        self.overlay_renderer = OverlayRenderer()
+        # Distinct, always opaque red box with a filled label for advice images
+        self.advice_renderer = OverlayRenderer(
+            color=(0, 0, 255),
+            thickness=3,
+            font_scale=0.7,
+            text_color=(255, 255, 255),
+            fill_label=True,
+            alpha=1.0,
+        )
+
+    def close(self):
+        self.overlay_renderer.close()
+        with self._encoder_lock:
+            if self._encoder is not None:
+                self._encoder.close()
+                self._encoder = None
 
     def extract_and_annotate_frame(
         self,
@@ -39,97 +81,175 @@ class VideoService:
             return False
 
         if box_2d and len(box_2d) == 4:
-            h, w, _ = frame.shape
-            ymin, xmin, ymax, xmax = box_2d
-            start_point = (int(xmin * w / 1000), int(ymin * h / 1000))
-            end_point = (int(xmax * w / 1000), int(ymax * h / 1000))
-
-            # Draw distinct box for advice
-            cv2.rectangle(frame, start_point, end_point, (0, 0, 255), 3)  # Red box
-
-            # Add label background
-            label_size, baseline = cv2.getTextSize(
-                label, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2
-            )
-            cv2.rectangle(
-                frame,
-                (start_point[0], start_point[1] - label_size[1] - 10),
-                (start_point[0] + label_size[0], start_point[1]),
-                (0, 0, 255),
-                cv2.FILLED,
-            )
-            cv2.putText(
-                frame,
-                label,
-                (start_point[0], start_point[1] - 5),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                (255, 255, 255),
-                2,
-            )
+            self.advice_renderer.draw(frame, [{"box_2d": box_2d, "label": label}])
 
         cv2.imwrite(output_path, frame)
         return True
 
-    def extract_frames(self, video_path: str, sample_rate: int = 5):
-        cap = cv2.VideoCapture(video_path)
-        frames = []
+    def _sample_reader(self, cap, sample_rate: int, max_frames: int | None):
+        # read(out=None) returns the next sampled frame, decoded into out when
+        # the shapes match, or None at the end of the video
         frame_count = 0
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        while cap.isOpened():
-            ret, frame = cap.read()
+        sampled = 0
+
+        def read(out=None):
+            nonlocal frame_count, sampled
+            if max_frames is not None and sampled >= max_frames:
+                return None
+            while frame_count % sample_rate != 0:
+                # grab() skips decoding into BGR for frames we drop
+                if not cap.grab():
+                    return None
+                frame_count += 1
+            ret, frame = cap.read(out)
             if not ret:
-                break
-            if frame_count % sample_rate == 0:
-                frames.append(frame)
+                return None
+            sampled += 1
             frame_count += 1
-        cap.release()
+            return frame
+
+        return read
+
+    def _sampled_frames(self, cap, sample_rate: int, max_frames: int | None):
+        read = self._sample_reader(cap, sample_rate, max_frames)
+        while (frame := read()) is not None:
+            yield frame
+
+    def extract_frames(
+        self, video_path: str, sample_rate: int = 5, max_frames: int | None = None
+    ):
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        try:
+            frames = list(self._sampled_frames(cap, sample_rate, max_frames))
+        finally:
+            cap.release()
         return frames, fps
 
+    def probe(self, video_path: str):
+        # (frame_count, width, height)
+        cap = cv2.VideoCapture(video_path)
+        try:
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if count <= 0:
+                # Not in the container header (e.g. some WebM/MKV); count them
+                count = 0
+                while cap.grab():
+                    count += 1
+        finally:
+            cap.release()
+        return count, width, height
+
+    def frame_count(self, video_path: str):
+        return self.probe(video_path)[0]
+
+    def extract_jpeg_frames(
+        self,
+        video_path: str,
+        sample_rate: int = 5,
+        max_frames: int | None = None,
+        keep_frames: bool = True,
+    ):
+        # Sampled frames and their JPEG encodings. Frames are decoded straight
+        # into the encoder pool's shared-memory ring and copied out only when
+        # keep_frames is set (otherwise None is returned for them); when the
+        # pool is disabled, broken or in use by another video they are decoded
+        # and encoded inline.
+        if self.encoder_processes > 0 and self._encoder_lock.acquire(blocking=False):
+            try:
+                result = self._extract_with_encoder(
+                    video_path, sample_rate, max_frames, keep_frames
+                )
+            finally:
+                self._encoder_lock.release()
+            if result is not None:
+                return result
+
+        frames, fps = self.extract_frames(video_path, sample_rate, max_frames)
+        encoded = [encode_jpeg(frame) for frame in frames]
+        return (frames if keep_frames else None), encoded, fps
+
+    def _extract_with_encoder(
+        self,
+        video_path: str,
+        sample_rate: int,
+        max_frames: int | None,
+        keep_frames: bool,
+    ):
+        if self._encoder is None:
+            try:
+                self._encoder = FrameEncoder(self.encoder_processes)
+            except (OSError, RuntimeError) as e:
+                print(f"WARNING: Could not start JPEG encoder processes: {e}")
+                self.encoder_processes = 0
+                return None
+
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        try:
+            frames, encoded = self._encoder.encode(
+                self._sample_reader(cap, sample_rate, max_frames),
+                (height, width, 3),
+                keep=keep_frames,
+            )
+            return frames, encoded, fps
+        except FrameWorkerError as e:
+            # Results of the broken pool can't be trusted; start a fresh one
+            # next time and redo this video inline
+            print(f"WARNING: {e}, encoding frames inline")
+            self._encoder.close()
+            self._encoder = None
+            return None
+        finally:
+            cap.release()
+
+    def parse_boxes(self, text: str, frame_index: int = 0):
+        boxes = []
+        try:
+            # Clean up markdown
+            if "```json" in text:
+                text = text.split("```json")[1].split("```")[0]
+            elif "```" in text:
+                text = text.split("```")[1].split("```")[0]
+
+            boxes_data = json.loads(text)
+
+            # Validation
+            if isinstance(boxes_data, list):
+                for item in boxes_data:
+                    if isinstance(item, dict) and "box_2d" in item and "label" in item:
+                        boxes.append(item)
+                    else:
+                        print(
+                            f"WARNING: Invalid item format in frame {frame_index}: {item}"
+                        )
+            else:
+                print(
+                    f"WARNING: Expected list but got {type(boxes_data)} in frame {frame_index}: {boxes_data}"
+                )
+
+        except Exception as e:
+            print(f"ERROR: Failed to parse parsing JSON for frame {frame_index}: {e}")
+            print(f"DEBUG: Raw text was: {text[:100]}...")
+        return boxes
+
     def draw_bounding_boxes(
         self, frames: list, analysis_results: list, sample_rate: int = 5
     ):
-        processed_frames = []
         num_frames = len(frames)
 
         # Parse all boxes first
-        parsed_boxes = []
-        for i in range(len(analysis_results)):
-            boxes = []
-            text = analysis_results[i]
-            try:
-                # Clean up markdown
-                if "```json" in text:
-                    text = text.split("```json")[1].split("```")[0]
-                elif "```" in text:
-                    text = text.split("```")[1].split("```")[0]
-
-                boxes_data = json.loads(text)
-
-                # Validation
-                if isinstance(boxes_data, list):
-                    for item in boxes_data:
-                        if (
-                            isinstance(item, dict)
-                            and "box_2d" in item
-                            and "label" in item
-                        ):
-                            boxes.append(item)
-                        else:
-                            print(f"WARNING: Invalid item format in frame {i}: {item}")
-                else:
-                    print(
-                        f"WARNING: Expected list but got {type(boxes_data)} in frame {i}: {boxes_data}"
-                    )
-
-            except Exception as e:
-                print(f"ERROR: Failed to parse parsing JSON for frame {i}: {e}")
-                print(f"DEBUG: Raw text was: {text[:100]}...")
-                pass
-            parsed_boxes.append(boxes)
+        parsed_boxes = [
+            self.parse_boxes(text, i) for i, text in enumerate(analysis_results)
+        ]
 
+        frame_boxes = []
         for i in range(num_frames):
-            frame = frames[i]
+            boxes = []
             # Find current and next sampled frame index
             current_sample_idx = i // sample_rate
             next_sample_idx = current_sample_idx + 1
@@ -143,7 +263,6 @@ class VideoService:
                 # Simple heuristic: interpolate boxes that have the same label/index
                 # In a real app, we'd use object IDs, but here we just match by index
                 for j in range(max(len(current_boxes), len(next_boxes))):
-                    box_data = None
                     if j < len(current_boxes) and j < len(next_boxes):
                         # Interpolate
                         if isinstance(current_boxes[j], dict) and isinstance(
@@ -159,76 +278,206 @@ class VideoService:
                                     int(b1[3] + (b2[3] - b1[3]) * progress),
                                 ]
                                 label = current_boxes[j].get("label", "person")
-                                self._draw_box(frame, interp_box, label)
+                                boxes.append({"box_2d": interp_box, "label": label})
                     elif j < len(current_boxes):
                         # Use current
-                        if isinstance(current_boxes[j], dict):
-                            self._draw_box(
-                                frame,
-                                current_boxes[j].get("box_2d"),
-                                current_boxes[j].get("label", "person"),
-                            )
+                        boxes.append(current_boxes[j])
             else:
                 # Last sample or beyond, just use current
-                current_boxes = (
-                    parsed_boxes[current_sample_idx]
-                    if current_sample_idx < len(parsed_boxes)
-                    else []
-                )
-                for box_data in current_boxes:
-                    if isinstance(box_data, dict):
-                        self._draw_box(
-                            frame,
-                            box_data.get("box_2d"),
-                            box_data.get("label", "person"),
-                        )
+                if current_sample_idx < len(parsed_boxes):
+                    boxes = parsed_boxes[current_sample_idx]
 
-            processed_frames.append(frame)
-        return processed_frames
-
-    def _draw_box(self, frame, box, label):
-        if box and len(box) == 4:
-            h, w, _ = frame.shape
-            ymin, xmin, ymax, xmax = box
-            start_point = (int(xmin * w / 1000), int(ymin * h / 1000))
-            end_point = (int(xmax * w / 1000), int(ymax * h / 1000))
-            cv2.rectangle(frame, start_point, end_point, (0, 255, 0), 2)
-            cv2.putText(
-                frame,
-                label,
-                (start_point[0], start_point[1] - 10),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.5,
-                (0, 255, 0),
-                2,
-            )
-
-    def reassemble_video(self, frames: list, output_path: str, fps: float):
-        if not frames:
-            return
-        h, w, _ = frames[0].shape
+            frame_boxes.append(boxes)
+        return self.overlay_renderer.render_many(frames, frame_boxes)
 
+    def open_writer(self, output_path: str, fps: float, size: tuple):
         # Determine codec based on extension or default to vp09 for webm
         if output_path.endswith(".webm"):
             # Try vp80 (VP8) first as it has better compatibility in some OpenCV builds
             fourcc = cv2.VideoWriter_fourcc(*"vp80")
-            out = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
+            out = cv2.VideoWriter(output_path, fourcc, fps, size)
             if not out.isOpened():
                 print("WARNING: 'vp80' codec failed. Falling back to 'vp09'.")
                 fourcc = cv2.VideoWriter_fourcc(*"vp09")
-                out = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
+                out = cv2.VideoWriter(output_path, fourcc, fps, size)
         else:
             # Default to avc1/mp4v for mp4
             fourcc = cv2.VideoWriter_fourcc(*"avc1")
-            out = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
+            out = cv2.VideoWriter(output_path, fourcc, fps, size)
             if not out.isOpened():
                 print("WARNING: 'avc1' codec failed. Falling back to 'mp4v'.")
                 fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-                out = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
+                out = cv2.VideoWriter(output_path, fourcc, fps, size)
 
         if not out.isOpened():
             print("ERROR: Failed to open VideoWriter.")
+            return None
+        return out
+
+    def render_tracked(self, video_path: str, keyframe_boxes: dict, output_path: str):
+        # Streams every frame of the video to the writer, re-anchoring the
+        # tracker on each keyframe's detections and propagating boxes between
+        # them. Three overlapping stages: decoding and tracking stay sequential
+        # on this thread, overlays are drawn on the renderer's pool, and a
+        # writer thread encodes the frames in order.
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        tracker = BoxTracker()
+
+        def tracked():
+            frame_index = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                if frame_index in keyframe_boxes:
+                    tracker.reset(frame, keyframe_boxes[frame_index])
+                else:
+                    tracker.update(frame)
+                yield frame, tracker.boxes(frame.shape)
+                frame_index += 1
+
+        out = None
+        writer = None
+        write_queue = queue.Queue(maxsize=RENDER_WRITE_QUEUE)
+        write_errors = []
+
+        def write():
+            # Keeps draining after a failure so the producer never blocks
+            while (frame := write_queue.get()) is not None:
+                if not write_errors:
+                    try:
+                        out.write(frame)
+                    except cv2.error as e:
+                        write_errors.append(e)
+
+        written = 0
+        try:
+            for frame in self.overlay_renderer.render_stream(tracked()):
+                if out is None:
+                    h, w, _ = frame.shape
+                    out = self.open_writer(output_path, fps, (w, h))
+                    if out is None:
+                        return 0
+                    writer = threading.Thread(target=write, name="render-writer")
+                    writer.start()
+                write_queue.put(frame)
+                written += 1
+        finally:
+            if writer is not None:
+                write_queue.put(None)
+                writer.join()
+            cap.release()
+            if out is not None:
+                out.release()
+        if write_errors:
+            raise write_errors[0]
+        return written
+
+    def reassemble_video(self, frames: list, output_path: str, fps: float):
+        if not frames:
+            return
+        h, w, _ = frames[0].shape
+
+        out = self.open_writer(output_path, fps, (w, h))
+        if out is None:
             return
         for frame in frames:
             out.write(frame)
         out.release()
+
+    def transcode_proxy(
+        self,
+        input_path: str,
+        output_path: str,
+        max_height: int = PROXY_MAX_HEIGHT,
+        fps: float = PROXY_FPS,
+        gop: int = PROXY_GOP,
+    ):
+        # Normalized analysis rendition: capped resolution, constant frame rate
+        # and a short GOP so later seeks (extract_and_annotate_frame) are cheap.
+        if shutil.which("ffmpeg"):
+            result = subprocess.run(
+                [
+                    "ffmpeg",
+                    "-y",
+                    "-loglevel",
+                    "error",
+                    "-i",
+                    input_path,
+                    "-an",
+                    "-vf",
+                    f"fps={fps},scale=-2:'min({max_height},ih)'",
+                    "-c:v",
+                    "libx264",
+                    "-preset",
+                    "veryfast",
+                    "-crf",
+                    "23",
+                    "-g",
+                    str(gop),
+                    "-keyint_min",
+                    str(gop),
+                    "-sc_threshold",
+                    "0",
+                    "-pix_fmt",
+                    "yuv420p",
+                    "-movflags",
+                    "+faststart",
+                    output_path,
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode == 0:
+                return True
+            print(f"WARNING: ffmpeg proxy transcode failed: {result.stderr[-500:]}")
+
+        return self._transcode_proxy_opencv(input_path, output_path, max_height, fps)
+
+    def _transcode_proxy_opencv(
+        self, input_path: str, output_path: str, max_height: int, fps: float
+    ):
+        # Fallback without ffmpeg. Frames are resampled onto a constant fps
+        # grid using their presentation timestamps, which also normalizes VFR
+        # sources. The GOP can't be set through cv2.VideoWriter; the mp4v
+        # encoder's default of 12 frames is already short.
+        cap = cv2.VideoCapture(input_path)
+        out = None
+        written = 0
+        next_ts = 0.0
+        pending = None
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                ts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+                h, w, _ = frame.shape
+                if h > max_height:
+                    w = int(round(w * max_height / h / 2)) * 2
+                    h = max_height
+                    frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+                if out is None:
+                    out = self.open_writer(output_path, fps, (w, h))
+                    if out is None:
+                        return False
+
+                # Repeat the previous frame for grid slots before this frame's
+                # timestamp, drop frames that arrive faster than the grid.
+                while pending is not None and next_ts < ts - 1e-6:
+                    out.write(pending)
+                    written += 1
+                    next_ts = written / fps
+                pending = frame
+
+            if pending is not None:
+                out.write(pending)
+                written += 1
+        finally:
+            cap.release()
+            if out is not None:
+                out.release()
+
+        return written > 0
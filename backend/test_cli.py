@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+
+import cv2
+import numpy as np
+import pytest
+
+import cli
+from cli import load_checkpoint
+from services import analysis_service
+
+
+def test_checkpoint_matches_mode_and_backend():
+    entries = [
+        {
+            "input": "/v/a.mp4",
+            "status": "completed",
+            "mode": "sampled",
+            "backend": "fake",
+        },
+        {
+            "input": "/v/b.mp4",
+            "status": "completed",
+            "mode": "tracked",
+            "backend": "fake",
+        },
+        {
+            "input": "/v/c.mp4",
+            "status": "completed",
+            "mode": "sampled",
+            "backend": "gemini",
+        },
+        {"input": "/v/d.mp4", "status": "failed", "mode": "sampled", "backend": "fake"},
+        # Written before entries recorded their mode and backend
+        {"input": "/v/e.mp4", "status": "completed"},
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkpoint.jsonl")
+        with open(path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            # Interrupted mid-write
+            f.write('{"input": "/v/f.mp4", "sta')
+
+        assert set(load_checkpoint(path, "sampled", "fake")) == {"/v/a.mp4"}
+        assert set(load_checkpoint(path, "tracked", "fake")) == {"/v/b.mp4"}
+        assert set(load_checkpoint(path, "sampled", "gemini")) == {"/v/c.mp4"}
+        assert (
+            load_checkpoint(os.path.join(tmp, "missing.jsonl"), "sampled", "fake") == {}
+        )
+
+
+@pytest.mark.parametrize("use_proxy", [False, True])
+def test_analyze_with_and_without_proxy(monkeypatch, use_proxy):
+    monkeypatch.setattr(cli, "ANALYSIS_USE_PROXY", use_proxy)
+    monkeypatch.setattr(analysis_service, "ANALYSIS_USE_PROXY", use_proxy)
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "a.mp4")
+        out = cv2.VideoWriter(
+            video_path, cv2.VideoWriter_fourcc(*"mp4v"), 10.0, (160, 120)
+        )
+        for i in range(20):
+            out.write(np.full((120, 160, 3), i * 10, dtype=np.uint8))
+        out.release()
+
+        output_dir = os.path.join(tmp, "out")
+        cli._init_worker(output_dir, True, "sampled")
+        analysis = cli._worker["analysis"]
+        analysis.gemini_service.latency_ms = 0
+        analysis.gemini_service.error_rate = 0
+        try:
+            result, frames = cli._worker["loop"].run_until_complete(
+                cli._analyze(video_path, "a-id")
+            )
+        finally:
+            cli._worker["loop"].close()
+            analysis.close()
+            analysis.video_service.close()
+            analysis.gemini_service.model_log.stop()
+
+        assert frames > 0
+        assert os.path.exists(result["processed_url"])
+        original = os.path.join(output_dir, "uploads", "a-id", "a.mp4")
+        # The original is only stored when it is what gets analyzed
+        assert os.path.exists(original) != use_proxy
@@ -0,0 +1,108 @@
+import os
+import queue
+import tempfile
+
+import cv2
+import numpy as np
+import pytest
+
+from services.frame_ring import FrameRing
+from services.video_service import VideoService
+
+
+def _write_video(path, num_frames=40):
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 20.0, (320, 240))
+    for i in range(num_frames):
+        frame = np.full((240, 320, 3), i * 5, dtype=np.uint8)
+        out.write(frame)
+    out.release()
+
+
+def test_slots_are_recycled():
+    with FrameRing(2, 4 * 4 * 3) as ring:
+        first = ring.acquire()
+        second = ring.acquire()
+        ring.view(first, (4, 4, 3))[:] = 7
+        ring.publish(first, "meta")
+
+        slot, meta = ring.get(timeout=1)
+        assert (slot, meta) == (first, "meta")
+        assert ring.view(slot, (2, 8, 3)).max() == 7
+        assert ring.fits((4, 4, 3)) and not ring.fits((5, 4, 3))
+        ring.release(slot)
+        ring.release(second)
+        assert sorted([ring.acquire(timeout=1), ring.acquire(timeout=1)]) == [0, 1]
+        with pytest.raises(queue.Empty):
+            ring.acquire(timeout=0.1)
+
+
+def _assert_matches(frames, encoded):
+    assert len(encoded) == len(frames)
+    for frame, data in zip(frames, encoded):
+        decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        assert decoded.shape == frame.shape
+        assert abs(int(decoded.mean()) - int(frame.mean())) <= 2
+
+
+def test_extract_jpeg_frames_matches_sequential_encoding():
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "clip.mp4")
+        _write_video(video_path)
+
+        inline = VideoService(encoder_processes=0)
+        frames, fps = inline.extract_frames(video_path, sample_rate=5)
+        assert len(frames) == 8
+
+        service = VideoService(encoder_processes=2)
+        try:
+            shared_frames, encoded, shared_fps = service.extract_jpeg_frames(
+                video_path, sample_rate=5
+            )
+            assert shared_fps == fps
+            # Kept frames are copied out before their ring slot is reused
+            assert all(map(np.array_equal, shared_frames, frames))
+            _assert_matches(frames, encoded)
+
+            # Without keep_frames the frames never leave the ring
+            dropped, dropped_encoded, _ = service.extract_jpeg_frames(
+                video_path, sample_rate=5, keep_frames=False
+            )
+            assert dropped is None
+            _assert_matches(frames, dropped_encoded)
+
+            # The pool is reused across videos
+            encoder = service._encoder
+            limited, limited_encoded, _ = service.extract_jpeg_frames(
+                video_path, sample_rate=5, max_frames=3
+            )
+            assert service._encoder is encoder
+            assert len(limited) == 3
+            _assert_matches(limited, limited_encoded)
+        finally:
+            service.close()
+
+
+def test_dead_encoder_falls_back_to_inline():
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "clip.mp4")
+        _write_video(video_path)
+
+        service = VideoService(encoder_processes=1)
+        try:
+            service.extract_jpeg_frames(video_path, sample_rate=5, max_frames=1)
+            for worker in service._encoder.workers:
+                worker.kill()
+                worker.join()
+
+            frames, encoded, _ = service.extract_jpeg_frames(video_path, sample_rate=5)
+            assert service._encoder is None
+            _assert_matches(frames, encoded)
+        finally:
+            service.close()
+
+
+if __name__ == "__main__":
+    test_slots_are_recycled()
+    test_extract_jpeg_frames_matches_sequential_encoding()
+    test_dead_encoder_falls_back_to_inline()
+    print("✅ Frame ring tests passed!")
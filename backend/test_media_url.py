@@ -0,0 +1,90 @@
+import tempfile
+import urllib.parse
+
+import google.auth
+import pytest
+from google.oauth2.credentials import Credentials as UserCredentials
+
+from services import local_storage_service, media_url_service
+from services.gcs_service import GCSService
+from services.local_storage_service import LocalStorageService
+from services.media_url_service import MediaUrlService
+
+
+class CountingStorage:
+    def __init__(self):
+        self.calls = 0
+
+    def can_sign(self):
+        return True
+
+    def get_signed_url(self, blob_name, expiration=3600):
+        self.calls += 1
+        return f"https://signed/{blob_name}?v={self.calls}"
+
+
+def test_signed_urls_are_refreshed_before_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(media_url_service.time, "time", lambda: now[0])
+    storage = CountingStorage()
+    service = MediaUrlService(
+        storage, mode="signed", ttl_seconds=900, refresh_seconds=300
+    )
+
+    first = service.url_for("processed/a.webm")
+    # Cached while more than refresh_seconds of validity remain
+    now[0] += 599
+    assert service.url_for("processed/a.webm") == first
+    assert storage.calls == 1
+
+    # Re-signed once it gets within refresh_seconds of expiring
+    now[0] += 2
+    second = service.url_for("processed/a.webm")
+    assert second != first
+    assert storage.calls == 2
+    now[0] += 599
+    assert service.url_for("processed/a.webm") == second
+    assert storage.calls == 2
+
+
+def test_proxy_mode_does_not_sign():
+    storage = CountingStorage()
+    service = MediaUrlService(storage, mode="proxy", base_url="http://api")
+    assert service.url_for("processed/a.webm") == "http://api/files/processed/a.webm"
+    assert storage.calls == 0
+
+
+def test_local_signed_urls_verify(monkeypatch):
+    storage = LocalStorageService(root=tempfile.mkdtemp())
+    url = storage.get_signed_url("processed/id/advice.jpg", expiration=60)
+    parsed = urllib.parse.urlparse(url)
+    query = urllib.parse.parse_qs(parsed.query)
+    blob_name = urllib.parse.unquote(parsed.path.removeprefix("/local-media/"))
+    expires = int(query["expires"][0])
+    signature = query["signature"][0]
+
+    assert blob_name == "processed/id/advice.jpg"
+    assert storage.verify_signed_url(blob_name, expires, signature)
+    assert not storage.verify_signed_url("processed/id/other.jpg", expires, signature)
+    assert not storage.verify_signed_url(blob_name, expires + 60, signature)
+    assert not storage.verify_signed_url(blob_name, expires, "0" * len(signature))
+
+    monkeypatch.setattr(local_storage_service.time, "time", lambda: expires + 1)
+    assert not storage.verify_signed_url(blob_name, expires, signature)
+
+
+def test_user_credentials_fall_back_to_proxy(monkeypatch):
+    # Application-default user credentials have no key and no service account
+    credentials = UserCredentials(token="token")
+    monkeypatch.setattr(
+        google.auth, "default", lambda scopes=None: (credentials, "project")
+    )
+    gcs = GCSService()
+    assert not gcs.can_sign()
+    with pytest.raises(RuntimeError):
+        gcs.get_signed_url("processed/a.webm")
+
+    service = MediaUrlService(gcs, mode="redirect", base_url="http://api")
+    service.check_signing()
+    assert service.mode == "proxy"
+    assert service.url_for("processed/a.webm") == "http://api/files/processed/a.webm"
@@ -0,0 +1,45 @@
+import numpy as np
+
+from services.overlay_renderer import OverlayRenderer
+
+
+def _frames(count: int):
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (120, 160, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def _boxes(i: int):
+    return [{"box_2d": [100 + i, 100, 600, 400 + i], "label": f"player {i % 3}"}]
+
+
+def test_render_stream_matches_serial_draw_in_order():
+    frames = _frames(20)
+    serial = OverlayRenderer(workers=1)
+    expected = [serial.draw(f.copy(), _boxes(i)) for i, f in enumerate(frames)]
+
+    renderer = OverlayRenderer(workers=3)
+    pulled = []
+
+    def items():
+        for i, frame in enumerate(frames):
+            pulled.append(i)
+            yield frame.copy(), _boxes(i)
+
+    try:
+        for i, drawn in enumerate(renderer.render_stream(items())):
+            # Only a bounded window of frames is taken ahead of the consumer
+            assert len(pulled) <= i + 2 * renderer.workers
+            assert np.array_equal(drawn, expected[i])
+        assert i == len(frames) - 1
+    finally:
+        renderer.close()
+
+
+def test_blended_overlay_only_touches_box_region():
+    frame = np.zeros((200, 300, 3), dtype=np.uint8)
+    renderer = OverlayRenderer(alpha=0.5, workers=1)
+    renderer.draw(frame, [{"box_2d": [500, 500, 900, 900], "label": "p"}])
+
+    assert frame[:80, :120].max() == 0
+    # Half-opacity green outline
+    assert frame[180, 200:260, 1].max() in (127, 128)
@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+import pytest
+
+from services.person_filter import PersonFilter, create_person_filter
+
+
+@pytest.fixture
+def make_filter(monkeypatch):
+    # HOG detections are stubbed per frame, so the detector itself (missing
+    # from OpenCV 5) is never used
+    monkeypatch.setattr(cv2, "HOGDescriptor", object, raising=False)
+
+    def make(detections, **kwargs):
+        person_filter = PersonFilter(padding=0.0, **kwargs)
+        queue = list(detections)
+        person_filter.detect = lambda frame: queue.pop(0)
+        return person_filter
+
+    return make
+
+
+def test_to_frame_boxes_maps_crop_to_frame(make_filter):
+    person_filter = make_filter([], crop=True)
+    # 400x200 crop at (100, 50) of a 1000x500 frame
+    region = (100, 50, 500, 250)
+    boxes = [
+        {"box_2d": [0, 0, 1000, 1000], "label": "person"},
+        {"box_2d": [500, 250, 750, 500], "label": "player"},
+        {"box_2d": [1, 2, 3], "label": "broken"},
+        {"label": "no box"},
+    ]
+
+    mapped = person_filter.to_frame_boxes(boxes, region, (500, 1000, 3))
+
+    assert mapped == [
+        {"box_2d": [100, 100, 500, 500], "label": "person"},
+        {"box_2d": [300, 200, 400, 300], "label": "player"},
+    ]
+
+
+def test_full_frame_region_is_identity(make_filter):
+    person_filter = make_filter([])
+    boxes = [{"box_2d": [120, 340, 560, 780], "label": "person"}]
+    assert person_filter.to_frame_boxes(boxes, (0, 0, 640, 360), (360, 640)) == boxes
+
+
+def test_stats_count_skipped_and_cropped_frames(make_filter):
+    frames = [np.zeros((360, 640, 3), np.uint8) for _ in range(4)]
+    person = [(100, 50, 64, 128)]
+    detections = [person, [], [(300, 100, 64, 128), (400, 80, 64, 128)], []]
+
+    cropping = make_filter(detections, crop=True)
+    regions = cropping.regions(frames)
+    assert regions == [(100, 50, 164, 178), None, (300, 80, 464, 228), None]
+    assert cropping.stats() == {
+        "frames_checked": 4,
+        "model_calls_saved": 2,
+        "frames_cropped": 2,
+    }
+
+    whole = make_filter(detections)
+    assert whole.regions(frames) == [(0, 0, 640, 360), None, (0, 0, 640, 360), None]
+    assert whole.stats() == {
+        "frames_checked": 4,
+        "model_calls_saved": 2,
+        "frames_cropped": 0,
+    }
+
+
+def test_missing_hog_disables_filter(monkeypatch):
+    monkeypatch.delattr(cv2, "HOGDescriptor", raising=False)
+    assert create_person_filter(enabled=True) is None
+    assert create_person_filter(enabled=False) is None
@@ -0,0 +1,122 @@
+import asyncio
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from services.analysis_service import (
+    MAX_ANALYZED_FRAMES,
+    SAMPLE_RATE,
+    AnalysisService,
+    keyframe_interval,
+)
+from services.box_tracker import BoxTracker
+from services.fake_gemini_service import FakeGeminiService
+from services.local_storage_service import LocalStorageService
+from services.scratch_service import ScratchService
+from services.video_service import VideoService
+
+
+def _frame_with_patch(x: int, y: int, size=(240, 320)):
+    # Flat background with a textured patch for the tracker to follow
+    frame = np.full((*size, 3), 90, dtype=np.uint8)
+    patch = np.random.default_rng(0).integers(0, 255, (60, 40, 3), dtype=np.uint8)
+    frame[y : y + 60, x : x + 40] = patch
+    return frame
+
+
+def test_tracker_follows_motion():
+    tracker = BoxTracker()
+    first = _frame_with_patch(100, 80)
+    h, w = first.shape[:2]
+    # box_2d is [ymin, xmin, ymax, xmax] on a 0-1000 scale
+    box = [80 * 1000 // h, 100 * 1000 // w, 140 * 1000 // h, 140 * 1000 // w]
+    tracker.reset(first, [{"box_2d": box, "label": "player"}])
+    start = tracker.rects.copy()
+
+    for step in range(1, 4):
+        tracker.update(_frame_with_patch(100 + 4 * step, 80 + 2 * step))
+
+    dx0, dy0, dx1, dy1 = (tracker.rects - start)[0]
+    assert dx0 == pytest.approx(12, abs=1) and dx1 == pytest.approx(12, abs=1)
+    assert dy0 == pytest.approx(6, abs=1) and dy1 == pytest.approx(6, abs=1)
+    [moved] = tracker.boxes(first.shape)
+    assert moved["label"] == "player"
+    assert moved["box_2d"][1] > box[1] and moved["box_2d"][0] > box[0]
+
+
+def test_tracker_skips_invalid_boxes_and_keeps_featureless_ones():
+    tracker = BoxTracker()
+    frame = _frame_with_patch(100, 80)
+    tracker.reset(
+        frame,
+        [
+            {"box_2d": [0, 0, 100, 100], "label": "flat"},
+            {"box_2d": [500, 500, 500, 600]},
+            {"box_2d": [1, 2, 3]},
+            {"label": "no box"},
+        ],
+    )
+    assert tracker.labels == ["flat"]
+
+    # No corners on a flat background: the box stays where it was detected
+    tracker.update(_frame_with_patch(120, 90))
+    assert tracker.boxes(frame.shape)[0]["box_2d"] == [0, 0, 100, 100]
+
+
+@pytest.mark.parametrize("requested", [0, SAMPLE_RATE, 30])
+@pytest.mark.parametrize("frame_count", [0, 7, 50, 120, 1000, 12345])
+def test_keyframes_span_the_whole_video(frame_count, requested):
+    interval = keyframe_interval(frame_count, requested)
+    keyframes = list(range(0, frame_count, interval))[:MAX_ANALYZED_FRAMES]
+
+    assert interval >= max(requested, 1)
+    if frame_count:
+        # Every frame is at most one interval past its keyframe
+        assert keyframes[-1] + interval >= frame_count
+
+
+def test_tracked_run_stays_within_scratch_reservation(tmp_path):
+    # A mostly flat clip compresses far better than the rendered video, which
+    # has to encode every frame again with boxes drawn on it
+    video_path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(
+        video_path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (320, 240)
+    )
+    for step in range(90):
+        writer.write(_frame_with_patch(20 + 2 * step, 80))
+    writer.release()
+
+    storage = LocalStorageService(root=str(tmp_path / "storage"))
+    storage.upload_file(video_path, "uploads/clip/clip.mp4")
+    scratch = ScratchService(root=str(tmp_path / "scratch"))
+    released = []
+    release = scratch.release
+
+    async def record(space):
+        released.append((space.usage(), space.reserved_bytes))
+        await release(space)
+
+    scratch.release = record
+    video_service = VideoService(0)
+    analysis = AnalysisService(
+        storage,
+        FakeGeminiService(latency_ms=0),
+        video_service,
+        scratch,
+        storage.path,
+        inline_video=True,
+    )
+    try:
+        result = asyncio.run(
+            analysis.analyze("gs://local/uploads/clip/clip.mp4", "clip", "tracked")
+        )
+    finally:
+        analysis.close()
+        video_service.close()
+
+    assert result["processed_url"]
+    [(used, reserved)] = released
+    assert used > 2 * os.path.getsize(video_path)
+    assert used <= reserved
@@ -1,58 +1,83 @@
 import os
 import asyncio
+import tempfile
+
+from services.scratch_service import ScratchService
 
 
 async def test_cleanup():
-    print("Testing local file cleanup simulation...")
+    print("Testing scratch space cleanup...")
+    root = tempfile.mkdtemp(prefix="scratch-verify-")
+    scratch_service = ScratchService(root=root, budget_bytes=1024)
 
     # 1. Simulate /files proxy cleanup (BackgroundTasks simulation)
-    local_proxy_path = "temp_test_blob.mp4"
+    space = await scratch_service.acquire(reserve_bytes=64)
+    local_proxy_path = space.file("uploads/test/blob.mp4")
     with open(local_proxy_path, "w") as f:
         f.write("test data")
-
     print(f"Created proxy file: {local_proxy_path}")
 
-    # In main.py, we use background_tasks.add_task(os.remove, local_path)
-    # We simulate the execution of the background task
+    # In main.py, we use background_tasks.add_task(scratch_service.release, space)
     print("Simulating FastAPI BackgroundTask execution...")
-    if os.path.exists(local_proxy_path):
-        os.remove(local_proxy_path)
+    await scratch_service.release(space)
 
-    if not os.path.exists(local_proxy_path):
-        print("✅ Proxy file cleanup simulation verified.")
+    if not os.path.exists(space.path) and scratch_service.reserved_bytes == 0:
+        print("✅ Proxy file cleanup verified.")
     else:
-        print("❌ Proxy file cleanup simulation failed.")
+        print("❌ Proxy file cleanup failed.")
 
-    # 2. Simulate analyze_video cleanup (try...finally simulation)
+    # 2. Simulate analyze_video cleanup (workspace context manager)
     file_id = "test_uuid"
-    local_input_path = f"input_{file_id}.mp4"
-    local_output_path = f"output_{file_id}.webm"
-    advice_filename = f"advice_{file_id}.jpg"
-
-    files_to_check = [local_input_path, local_output_path, advice_filename]
-
-    for path in files_to_check:
-        with open(path, "w") as f:
-            f.write("test data")
-        print(f"Created temp file: {path}")
-
-    print("Simulating processing and finally block cleanup...")
-    # This matches the code in main.py:
-    # finally:
-    #     for path in [local_input_path, local_output_path, advice_filename]:
-    #         if os.path.exists(path):
-    #             os.remove(path)
-
-    for path in files_to_check:
-        if os.path.exists(path):
-            os.remove(path)
-            print(f"Deleted: {path}")
-
-    remaining = [p for p in files_to_check if os.path.exists(p)]
-    if not remaining:
-        print("✅ analyze_video cleanup simulation verified.")
+    try:
+        async with scratch_service.workspace(reserve_bytes=64) as space:
+            for name in [
+                f"input_{file_id}.mp4",
+                f"output_{file_id}.webm",
+                f"advice_{file_id}.jpg",
+            ]:
+                with open(space.file(name), "w") as f:
+                    f.write("test data")
+                print(f"Created temp file: {space.file(name)}")
+            raise RuntimeError("Simulated pipeline failure")
+    except RuntimeError:
+        pass
+
+    if not os.path.exists(space.path):
+        print("✅ analyze_video cleanup verified.")
+    else:
+        print(f"❌ analyze_video cleanup failed. Remaining: {os.listdir(space.path)}")
+
+    # 3. Two concurrent requests for the same blob must not share a path
+    first = await scratch_service.acquire(reserve_bytes=512)
+    second = await scratch_service.acquire(reserve_bytes=512)
+    if first.file("same.mp4") != second.file("same.mp4"):
+        print("✅ Concurrent requests are isolated.")
     else:
-        print(f"❌ analyze_video cleanup simulation failed. Remaining: {remaining}")
+        print("❌ Concurrent requests collided.")
+
+    # 4. The budget is full, so a third reservation has to wait for a release
+    waiter = asyncio.create_task(scratch_service.acquire(reserve_bytes=512))
+    await asyncio.sleep(0.05)
+    blocked = not waiter.done()
+    await scratch_service.release(first)
+    third = await asyncio.wait_for(waiter, timeout=1)
+    if blocked:
+        print("✅ Budget back-pressure verified.")
+    else:
+        print("❌ Reservation was granted over budget.")
+    await scratch_service.release(second)
+    await scratch_service.release(third)
+
+    # 5. Directories left behind by a dead process are swept at startup
+    stale_dir = os.path.join(root, "job-999999999-deadbeef")
+    os.makedirs(stale_dir)
+    ScratchService(root=root).sweep_stale()
+    if not os.path.exists(stale_dir):
+        print("✅ Stale scratch sweep verified.")
+    else:
+        print("❌ Stale scratch directory was not removed.")
+
+    os.rmdir(root)
 
 
 if __name__ == "__main__":
@@ -105,16 +105,35 @@ function App() {
     }
   }, []);
 
-  const handleAnalyze = async () => {
+  const handleAnalyze = () => {
     if (!videoData.gcs_uri) return;
     setAnalyzing(true);
-    try {
-      const res = await axios.post(`${API_URL}/analyze_video?gcs_uri=${videoData.gcs_uri}&file_id=${videoData.file_id}`);
-      setVideoData({ ...videoData, processed: res.data.processed_url, summary: res.data.summary, advice_url: res.data.advice_url });
-    } catch (err) {
-      console.error(err);
-    }
-    setAnalyzing(false);
+    setVideoData((prev) => ({ ...prev, processed: null, summary: '', advice_url: null }));
+
+    // Results are streamed over Server-Sent Events so the processed video and
+    // summary show up as soon as each stage finishes.
+    const params = new URLSearchParams({ gcs_uri: videoData.gcs_uri, file_id: videoData.file_id });
+    const source = new EventSource(`${API_URL}/analyze_video/stream?${params}`);
+
+    source.addEventListener('processed', (e) => {
+      const data = JSON.parse(e.data);
+      setVideoData((prev) => ({ ...prev, processed: data.processed_url }));
+    });
+    source.addEventListener('summary_delta', (e) => {
+      const data = JSON.parse(e.data);
+      setVideoData((prev) => ({ ...prev, summary: prev.summary + data.text }));
+    });
+    source.addEventListener('complete', (e) => {
+      const data = JSON.parse(e.data);
+      setVideoData((prev) => ({ ...prev, processed: data.processed_url, summary: data.summary, advice_url: data.advice_url }));
+      source.close();
+      setAnalyzing(false);
+    });
+    source.addEventListener('error', (e) => {
+      if (e.data) console.error(JSON.parse(e.data).detail);
+      source.close();
+      setAnalyzing(false);
+    });
   };
 
   const navItems = [
@@ -276,7 +295,7 @@ function App() {
                       AI Processed
                     </p>
                     <div className="aspect-video bg-black rounded-xl overflow-hidden border border-cyan-500/30">
-                      {analyzing ? (
+                      {analyzing && !videoData.processed ? (
                         <div className="w-full h-full flex flex-col items-center justify-center bg-slate-900/80">
                           <Loader2 className="w-10 h-10 text-cyan-400 animate-spin mb-3" />
                           <p className="text-white font-medium">Processing...</p>
@@ -301,7 +320,7 @@ function App() {
                 </h2>
                 <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
                   <div className="bg-slate-800/50 rounded-xl p-5 border border-slate-700">
-                    {analyzing ? (
+                    {analyzing && !videoData.summary ? (
                       <div className="space-y-3">
                         <div className="h-4 bg-slate-700 rounded animate-pulse"></div>
                         <div className="h-4 bg-slate-700 rounded w-5/6 animate-pulse"></div>